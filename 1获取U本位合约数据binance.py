@@ -5,31 +5,234 @@
 """
 
 import requests
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import time
+import os
+import asyncio
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import orjson  # 比标准库json更快的解析器(可选)
+except ImportError:
+    orjson = None
+
+try:
+    import requests_cache  # HTTP层响应缓存(可选)
+except ImportError:
+    requests_cache = None
+
+try:
+    import websockets  # 实时K线流(可选)
+except ImportError:
+    websockets = None
+
+try:
+    import xlsxwriter  # 更快的Excel写入引擎(可选,未安装时使用openpyxl)
+except ImportError:
+    xlsxwriter = None
+
+# 各时间周期对应的秒数(用于判断缓存窗口是否已完全收盘)
+PERIOD_SECONDS = {
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '2h': 7200,
+    '4h': 14400,
+    '6h': 21600,
+    '12h': 43200,
+    '1d': 86400,
+}
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.binance_cache')
+
+# 未收盘窗口的缓存有效期(秒)
+RECENT_CACHE_TTL = 300
+
+# 缓存目录(不含实时K线流文件)的大小上限,超过时从最早写入的文件开始删除
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# 实时K线流: 缓冲区每累计多少根收盘K线或每隔多少秒写入一次文件,断线重连的最长等待时间(秒)
+STREAM_FLUSH_CANDLES = 12
+STREAM_FLUSH_INTERVAL = 60
+STREAM_MAX_BACKOFF = 60
+
+# 缓存数据格式版本,缓存的DataFrame格式变化时递增,旧版本的缓存文件将不再被读取
+CACHE_VERSION = 2
+
+# 导出数据使用的北京时间(UTC+8,无夏令时),模块级常量避免每次调用时重新构造
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+# 导出的各数据源(按导出列顺序): (data_dict中的键, 名称, {原列名: 导出列名}, 有效数字位数)
+# 有效数字位数为None时保留原数据
+EXPORT_SOURCES = [
+    # 持仓量和持仓价值保留原数据,不做有效数字处理
+    ('open_interest', "持仓量数据", {
+        'sumOpenInterest': '持仓量',
+        'sumOpenInterestValue': '持仓价值(USD)',
+    }, None),
+    ('top_account_ratio', "大户账户数多空比", {
+        'longShortRatio': '大户账户多空比',
+        'longAccount': '大户多头账户占比',
+        'shortAccount': '大户空头账户占比',
+    }, 4),
+    ('top_position_ratio', "大户持仓量多空比", {
+        'longShortRatio': '大户持仓多空比',
+        'longAccount': '大户多头持仓占比',
+        'shortAccount': '大户空头持仓占比',
+    }, 4),
+    ('global_ratio', "多空持仓人数比", {
+        'longShortRatio': '全市场多空比',
+        'longAccount': '全市场多头人数占比',
+        'shortAccount': '全市场空头人数占比',
+    }, 4),
+    ('basis', "基差数据", {
+        'basis': '基差',
+        'basisRate': '基差率',
+    }, 4),
+    ('klines', "K线数据(OHLC)", {
+        'open': '开盘价',
+        'high': '最高价',
+        'low': '最低价',
+        'close': '收盘价',
+        'volume': '成交量',
+    }, 4),
+    # 资金费率通常很小,保留6位有效数字
+    ('funding_rate', "资金费率数据", {
+        'fundingRate': '资金费率',
+    }, 6),
+]
+
+# 币安每分钟请求权重上限为2400,已用权重超过该阈值时暂停请求直到下一分钟
+USED_WEIGHT_THRESHOLD = 2000
+
+
+def sig_round(values, n=4):
+    """
+    保留n位有效数字(NumPy向量化实现,全部由ufunc完成)
+    
+    参数:
+        values: ndarray、Series或DataFrame(DataFrame整块一次处理,不必逐列apply)
+        n: 有效数字位数
+    
+    返回:
+        与输入同类型的数据(0、NaN、inf保持不变),结果与逐个调用 round(x, n - 1 - 指数) 相同
+    """
+    a = np.asarray(values, dtype='float64')
+    mask = (a != 0) & np.isfinite(a)
+    exp = np.zeros_like(a)
+    exp[mask] = np.floor(np.log10(np.abs(a[mask])))
+    # 保留的小数位数(负数表示舍入到十位、百位...)
+    digits = n - 1 - exp
+    # 只用10的正整数次幂缩放(可被float精确表示): 小数位数>=0时先乘后除,否则先除后乘
+    # (10的负数次幂不能精确表示,用它缩放会在结果中留下误差,如123456789得到123500000.00000001)
+    scale = 10.0 ** np.abs(digits)
+    positive = digits >= 0
+    scaled = np.where(positive, a * scale, a / scale)
+    units = np.round(scaled)
+    rounded = np.where(positive, units / scale, units * scale)
+    # 缩放后接近 .5 的值,缩放的舍入误差可能改变进位方向,这些少数值逐个用 round() 计算
+    with np.errstate(invalid='ignore'):  # inf - inf 得到NaN,不参与比较
+        near_half = mask & (np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6)
+    for i in np.flatnonzero(near_half):
+        rounded.flat[i] = round(float(a.flat[i]), int(digits.flat[i]))
+    rounded = np.where(mask, rounded, a)
+    if isinstance(values, pd.DataFrame):
+        return pd.DataFrame(rounded, index=values.index, columns=values.columns)
+    if isinstance(values, pd.Series):
+        return pd.Series(rounded, index=values.index, name=values.name)
+    return rounded
+
+
+def _to_ms(t):
+    """将datetime转换为毫秒时间戳(已是毫秒时间戳则原样返回)"""
+    if isinstance(t, datetime):
+        return int(t.timestamp() * 1000)
+    return t
+
+
+def records_to_frame(data, float_columns, time_key='timestamp'):
+    """
+    将接口返回的记录直接转换为定类型的DataFrame
+    
+    逐列用 np.fromiter 解析为 int64/float64 数组,不经过 object 类型的中间DataFrame
+    在各批次的请求线程中调用,解析与其他批次的网络等待重叠进行;
+    单批最多约1000条记录,耗时为毫秒级,不值得放到进程池(序列化开销大于解析本身)
+    
+    参数:
+        data: 接口返回的记录列表(dict或list)
+        float_columns: {输出列名: 记录中的键或下标} 需要转换为float的列
+        time_key: 时间戳(毫秒)所在的键或下标
+    
+    返回:
+        DataFrame: timestamp列及float_columns中的各列
+    """
+    n = len(data)
+    timestamps = np.fromiter((r[time_key] for r in data), dtype='int64', count=n)
+    # 直接从int64数组转换(UTC时区),走pandas的numpy快速路径
+    cols = {'timestamp': pd.to_datetime(timestamps, unit='ms', utc=True)}
+    for name, key in float_columns.items():
+        cols[name] = np.fromiter((r[key] for r in data), dtype='float64', count=n)
+    return pd.DataFrame(cols)
+
 class BinanceOIHistory:
     """币安合约持仓量历史数据获取类"""
     
-    def __init__(self, symbol):
+    def __init__(self, symbol, max_concurrent_requests=8, cache_dir=DEFAULT_CACHE_DIR, http_cache=False):
         """
         初始化
         
         参数:
             symbol: 交易对,如 'BTCUSDT', 'ETHUSDT'
+            max_concurrent_requests: 同时进行中的最大请求数(各数据类型并发获取时共享)
+            cache_dir: Parquet缓存目录,为None时不使用缓存
+            http_cache: 是否使用 requests-cache 在HTTP层缓存响应(不使用Parquet缓存时的替代方案)
         """
         self.base_url = "https://fapi.binance.com"
         self.symbol = symbol.upper()
+        self.cache_dir = cache_dir
+        # 写入Parquet失败(未安装pyarrow)时置为True,不再读写批次缓存;
+        # 不修改cache_dir,其他线程可能正在用它拼接路径
+        self._cache_disabled = False
+        self.http_cache = http_cache
+        self.max_concurrent_requests = max_concurrent_requests
         self.session = self._create_session()
+        # 限制并发请求数,避免并发获取时触发API限制
+        self._request_semaphore = threading.BoundedSemaphore(max_concurrent_requests)
+        # 最近一次响应头中的已用权重及其所属分钟,所有请求线程共享
+        self._used_weight = 0
+        self._used_weight_minute = 0
+        self._weight_lock = threading.Lock()
         
     def _create_session(self):
         """
         创建带有重试机制的session
+        
+        连接池大小取自最大并发请求数(而不是固定的默认值10),修改并发数时连接池随之调整;
+        连接用尽时等待空闲连接,不会超出该数量
         """
-        session = requests.Session()
+        if self.http_cache and requests_cache is not None:
+            # 相同参数的GET请求直接从本地SQLite读取;请求出错时允许使用过期缓存
+            # 保存在本实例的缓存目录下(不使用Parquet缓存时放在默认缓存目录)
+            session = requests_cache.CachedSession(
+                os.path.join(self.cache_dir or DEFAULT_CACHE_DIR, 'http_cache'),
+                backend='sqlite',
+                expire_after=timedelta(hours=1),
+                allowable_methods=('GET',),
+                stale_if_error=True
+            )
+        else:
+            if self.http_cache:
+                print("⚠ 未安装 requests-cache,不使用HTTP缓存")
+            session = requests.Session()
         
         # 配置重试策略
         retry_strategy = Retry(
@@ -39,12 +242,47 @@ class BinanceOIHistory:
             allowed_methods=["GET"]  # 只对GET请求重试
         )
         
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=1,  # 只访问 fapi.binance.com 一个主机
+            pool_maxsize=self.max_concurrent_requests,  # 每个并发请求各保留一个长连接
+            pool_block=True  # 连接用尽时等待空闲连接,而不是新建临时连接
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         
         return session
     
+    def _wait_for_weight(self):
+        """
+        已用权重接近上限时,等待到下一分钟权重重置后再发送请求
+        """
+        with self._weight_lock:
+            current_minute = int(time.time() // 60)
+            if self._used_weight_minute != current_minute or self._used_weight <= USED_WEIGHT_THRESHOLD:
+                return
+            wait_time = 60 - (time.time() % 60)
+        print(f"    ⏳ 已用权重 {self._used_weight},等待 {wait_time:.1f} 秒至权重重置...")
+        time.sleep(wait_time)
+    
+    def _update_used_weight(self, response):
+        """
+        根据响应头 X-MBX-USED-WEIGHT-1M 记录当前分钟的已用权重
+        
+        来自 requests-cache 的响应没有实际发出请求,其中的权重是缓存时的旧值,不计入
+        """
+        if getattr(response, 'from_cache', False):
+            return
+        used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+        if used_weight is None:
+            return
+        with self._weight_lock:
+            current_minute = int(time.time() // 60)
+            if self._used_weight_minute != current_minute:
+                self._used_weight = 0
+                self._used_weight_minute = current_minute
+            self._used_weight = max(self._used_weight, int(used_weight))
+    
     def _make_request(self, url, params, max_retries=3):
         """
         统一的请求方法,带有重试机制
@@ -59,14 +297,23 @@ class BinanceOIHistory:
         """
         for attempt in range(max_retries):
             try:
-                response = self.session.get(
-                    url, 
-                    params=params, 
-                    timeout=30,  # 增加超时时间到30秒
-                    verify=True  # 启用SSL验证
-                )
+                self._wait_for_weight()
+                with self._request_semaphore:
+                    response = self.session.get(
+                        url, 
+                        params=params, 
+                        timeout=30,  # 增加超时时间到30秒
+                        verify=True  # 启用SSL验证
+                    )
+                self._update_used_weight(response)
                 response.raise_for_status()
-                return response.json()
+                if orjson is None:
+                    return response.json()
+                try:
+                    return orjson.loads(response.content)
+                except orjson.JSONDecodeError as e:
+                    # 与 response.json() 一样作为请求错误处理
+                    raise requests.exceptions.InvalidJSONError(str(e), response=response)
                 
             except requests.exceptions.SSLError as e:
                 print(f"    ⚠ SSL错误 (尝试 {attempt + 1}/{max_retries}): {str(e)[:100]}")
@@ -100,14 +347,128 @@ class BinanceOIHistory:
         
         return None
         
+    def _cache_path(self, endpoint, params):
+        """
+        根据 (交易对, 接口, 参数) 计算缓存文件路径
+        
+        路径格式: {cache_dir}/{symbol}/{接口名}/{period}/{md5}.parquet
+        """
+        key = hashlib.md5(
+            json.dumps({'version': CACHE_VERSION, 'symbol': self.symbol, 'endpoint': endpoint, **params}, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        endpoint_name = endpoint.rstrip('/').split('/')[-1]
+        period = params.get('period') or params.get('interval') or 'all'
+        return os.path.join(self.cache_dir, self.symbol, endpoint_name, period, f"{key}.parquet")
+    
+    def _cache_is_immutable(self, params, written_at):
+        """
+        判断缓存文件写入时请求窗口是否已完全收盘
+        
+        收盘后写入的历史数据不会再变化,缓存永久有效;写入时窗口尚未收盘的文件只包含部分数据,
+        只缓存 RECENT_CACHE_TTL 秒(即使窗口之后已收盘)
+        
+        参数:
+            params: 请求参数
+            written_at: 缓存文件的写入时间(秒级时间戳)
+        """
+        end_time = params.get('endTime')
+        if not end_time:
+            return False
+        period = params.get('period') or params.get('interval')
+        # 资金费率每8小时结算一次
+        period_seconds = PERIOD_SECONDS.get(period, 8 * 3600)
+        return end_time < (written_at - period_seconds) * 1000
+    
+    def _cache_get(self, endpoint, params):
+        """
+        读取缓存
+        
+        返回:
+            DataFrame或None(未命中、已过期或读取失败)
+        """
+        if not self.cache_dir or self._cache_disabled:
+            return None
+        
+        path = self._cache_path(endpoint, params)
+        if not os.path.exists(path):
+            return None
+        
+        written_at = os.path.getmtime(path)
+        if not self._cache_is_immutable(params, written_at) and time.time() - written_at > RECENT_CACHE_TTL:
+            return None
+        
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            print(f"    ⚠ 读取缓存失败,将重新请求: {str(e)[:100]}")
+            return None
+    
+    def _cache_put(self, endpoint, params, df):
+        """
+        写入缓存(先写临时文件再替换,避免并发读到不完整的文件)
+        """
+        if not self.cache_dir or self._cache_disabled or df is None or len(df) == 0:
+            return
+        
+        path = self._cache_path(endpoint, params)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            df.to_parquet(tmp_path, compression='zstd', index=False)
+            os.replace(tmp_path, path)
+        except ImportError as e:
+            # 未安装 pyarrow 时关闭缓存
+            print(f"    ⚠ 无法写入Parquet缓存(需要安装pyarrow),已关闭缓存: {e}")
+            self._cache_disabled = True
+        except Exception as e:
+            print(f"    ⚠ 写入缓存失败: {str(e)[:100]}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _prune_cache(self):
+        """
+        缓存目录超过 CACHE_MAX_BYTES 时,从最早写入的缓存文件开始删除(实时K线流文件不删除)
+        """
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        
+        files = []
+        for root, dirs, names in os.walk(self.cache_dir):
+            if 'stream' in dirs:
+                dirs.remove('stream')
+            for name in names:
+                if name.endswith('.parquet'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        
+        total = sum(size for _, size, _ in files)
+        if total <= CACHE_MAX_BYTES:
+            return
+        
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= CACHE_MAX_BYTES:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        print(f"🧹 缓存超过 {CACHE_MAX_BYTES // (1024 * 1024)} MB,已删除 {removed} 个最早的缓存文件")
+        
     def get_open_interest_hist(self, period='5m', start_time=None, end_time=None, limit=500):
         """
         获取历史持仓量数据
         
         参数:
             period: 时间周期 '5m','15m','30m','1h','2h','4h','6h','12h','1d'
-            start_time: 开始时间 (datetime对象或毫秒时间戳)
-            end_time: 结束时间 (datetime对象或毫秒时间戳)
+            start_time: 开始时间 (毫秒时间戳)
+            end_time: 结束时间 (毫秒时间戳)
             limit: 返回数据条数 (最大500)
         
         返回:
@@ -116,12 +477,6 @@ class BinanceOIHistory:
         endpoint = "/futures/data/openInterestHist"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'symbol': self.symbol,
             'period': period,
@@ -133,17 +488,22 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         if not data:
             return None
         
         # 转换为DataFrame
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['sumOpenInterest'] = df['sumOpenInterest'].astype(float)
-        df['sumOpenInterestValue'] = df['sumOpenInterestValue'].astype(float)
+        df = records_to_frame(data, {
+            'sumOpenInterest': 'sumOpenInterest',
+            'sumOpenInterestValue': 'sumOpenInterestValue',
+        })
         
+        self._cache_put(endpoint, params, df)
         return df
     
     def get_top_long_short_account_ratio(self, period='5m', start_time=None, end_time=None, limit=500):
@@ -152,8 +512,8 @@ class BinanceOIHistory:
         
         参数:
             period: 时间周期 '5m','15m','30m','1h','2h','4h','6h','12h','1d'
-            start_time: 开始时间
-            end_time: 结束时间
+            start_time: 开始时间 (毫秒时间戳)
+            end_time: 结束时间 (毫秒时间戳)
             limit: 返回数据条数 (最大500)
         
         返回:
@@ -162,12 +522,6 @@ class BinanceOIHistory:
         endpoint = "/futures/data/topLongShortAccountRatio"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'symbol': self.symbol,
             'period': period,
@@ -179,17 +533,22 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         if not data:
             return None
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['longShortRatio'] = df['longShortRatio'].astype(float)
-        df['longAccount'] = df['longAccount'].astype(float)
-        df['shortAccount'] = df['shortAccount'].astype(float)
+        df = records_to_frame(data, {
+            'longShortRatio': 'longShortRatio',
+            'longAccount': 'longAccount',
+            'shortAccount': 'shortAccount',
+        })
         
+        self._cache_put(endpoint, params, df)
         return df
     
     def get_top_long_short_position_ratio(self, period='5m', start_time=None, end_time=None, limit=500):
@@ -198,8 +557,8 @@ class BinanceOIHistory:
         
         参数:
             period: 时间周期 '5m','15m','30m','1h','2h','4h','6h','12h','1d'
-            start_time: 开始时间
-            end_time: 结束时间
+            start_time: 开始时间 (毫秒时间戳)
+            end_time: 结束时间 (毫秒时间戳)
             limit: 返回数据条数 (最大500)
         
         返回:
@@ -208,12 +567,6 @@ class BinanceOIHistory:
         endpoint = "/futures/data/topLongShortPositionRatio"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'symbol': self.symbol,
             'period': period,
@@ -225,17 +578,22 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         if not data:
             return None
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['longShortRatio'] = df['longShortRatio'].astype(float)
-        df['longAccount'] = df['longAccount'].astype(float)
-        df['shortAccount'] = df['shortAccount'].astype(float)
+        df = records_to_frame(data, {
+            'longShortRatio': 'longShortRatio',
+            'longAccount': 'longAccount',
+            'shortAccount': 'shortAccount',
+        })
         
+        self._cache_put(endpoint, params, df)
         return df
     
     def get_global_long_short_account_ratio(self, period='5m', start_time=None, end_time=None, limit=500):
@@ -244,8 +602,8 @@ class BinanceOIHistory:
         
         参数:
             period: 时间周期 '5m','15m','30m','1h','2h','4h','6h','12h','1d'
-            start_time: 开始时间
-            end_time: 结束时间
+            start_time: 开始时间 (毫秒时间戳)
+            end_time: 结束时间 (毫秒时间戳)
             limit: 返回数据条数 (最大500)
         
         返回:
@@ -254,12 +612,6 @@ class BinanceOIHistory:
         endpoint = "/futures/data/globalLongShortAccountRatio"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'symbol': self.symbol,
             'period': period,
@@ -271,17 +623,22 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         if not data:
             return None
         
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['longShortRatio'] = df['longShortRatio'].astype(float)
-        df['longAccount'] = df['longAccount'].astype(float)
-        df['shortAccount'] = df['shortAccount'].astype(float)
+        df = records_to_frame(data, {
+            'longShortRatio': 'longShortRatio',
+            'longAccount': 'longAccount',
+            'shortAccount': 'shortAccount',
+        })
         
+        self._cache_put(endpoint, params, df)
         return df
     
     
@@ -292,12 +649,6 @@ class BinanceOIHistory:
         endpoint = "/futures/data/basis"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'pair': self.symbol,
             'contractType': 'PERPETUAL',
@@ -310,6 +661,10 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         # *** 关键修复:检查数据有效性 ***
@@ -326,10 +681,11 @@ class BinanceOIHistory:
             return None
         
         # 转换为DataFrame
-        df = pd.DataFrame(data)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['basisRate'] = df['basisRate'].astype(float)
-        df['basis'] = df['basis'].astype(float)
+        df = records_to_frame(data, {
+            'basisRate': 'basisRate',
+            'basis': 'basis',
+        })
+        self._cache_put(endpoint, params, df)
         return df
 
     def get_funding_rate(self, start_time=None, end_time=None, limit=1000):
@@ -337,8 +693,8 @@ class BinanceOIHistory:
         获取资金费率历史数据
         
         参数:
-            start_time: 开始时间 (datetime对象或毫秒时间戳)
-            end_time: 结束时间 (datetime对象或毫秒时间戳)
+            start_time: 开始时间 (毫秒时间戳)
+            end_time: 结束时间 (毫秒时间戳)
             limit: 返回数据条数 (最大1000)
         
         返回:
@@ -347,12 +703,6 @@ class BinanceOIHistory:
         endpoint = "/fapi/v1/fundingRate"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'symbol': self.symbol,
             'limit': min(limit, 1000)  # 资金费率接口最大支持1000
@@ -363,20 +713,20 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         if not data or not isinstance(data, list) or len(data) == 0:
             return None
         
         # 转换为DataFrame
-        df = pd.DataFrame(data)
-        df['fundingTime'] = pd.to_datetime(df['fundingTime'], unit='ms')
-        df['fundingRate'] = df['fundingRate'].astype(float)
-        
-        # 重命名列以保持一致性
-        df = df.rename(columns={'fundingTime': 'timestamp'})
-        
-        return df[['timestamp', 'fundingRate']]
+        # fundingTime 统一命名为 timestamp 以保持一致性
+        df = records_to_frame(data, {'fundingRate': 'fundingRate'}, time_key='fundingTime')
+        self._cache_put(endpoint, params, df)
+        return df
 
     def get_klines(self, period='5m', start_time=None, end_time=None, limit=500):
         """
@@ -384,8 +734,8 @@ class BinanceOIHistory:
         
         参数:
             period: 时间周期 '5m','15m','30m','1h','2h','4h','6h','12h','1d'
-            start_time: 开始时间
-            end_time: 结束时间
+            start_time: 开始时间 (毫秒时间戳)
+            end_time: 结束时间 (毫秒时间戳)
             limit: 返回数据条数 (最大1500)
         
         返回:
@@ -394,12 +744,6 @@ class BinanceOIHistory:
         endpoint = "/fapi/v1/klines"
         url = self.base_url + endpoint
         
-        # 转换时间格式
-        if isinstance(start_time, datetime):
-            start_time = int(start_time.timestamp() * 1000)
-        if isinstance(end_time, datetime):
-            end_time = int(end_time.timestamp() * 1000)
-        
         params = {
             'symbol': self.symbol,
             'interval': period,
@@ -411,47 +755,199 @@ class BinanceOIHistory:
         if end_time:
             params['endTime'] = end_time
         
+        # 实时K线流已完整覆盖该时间段时直接使用,不再请求REST接口
+        streamed_df = self._stream_klines_get(period, start_time, end_time)
+        if streamed_df is not None:
+            return streamed_df
+        
+        cached_df = self._cache_get(endpoint, params)
+        if cached_df is not None:
+            return cached_df
+        
         data = self._make_request(url, params)
         
         if not data or not isinstance(data, list) or len(data) == 0:
             return None
         
         # 转换为DataFrame
-        df = pd.DataFrame(data, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            'close_time', 'quote_volume', 'trades', 'taker_buy_volume',
-            'taker_buy_quote_volume', 'ignore'
-        ])
-        
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['open'] = df['open'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['close'] = df['close'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-        # 只保留需要的列
-        return df[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+        # K线每条记录为数组: [开盘时间, 开, 高, 低, 收, 成交量, 收盘时间, ...],只保留需要的列
+        df = records_to_frame(data, {
+            'open': 1,
+            'high': 2,
+            'low': 3,
+            'close': 4,
+            'volume': 5,
+        }, time_key=0)
+        self._cache_put(endpoint, params, df)
+        return df
 
 
 
-    def _get_batched_data(self, fetch_func, data_name, period, start_date, end_date):
+    def _stream_klines_path(self, period):
+        """实时K线流保存的Parquet文件路径"""
+        return os.path.join(self.cache_dir, self.symbol, 'stream', f"kline_{period}.parquet")
+    
+    def _stream_klines_get(self, period, start_time, end_time):
+        """
+        从实时K线流文件中读取时间段内的K线
+        
+        返回:
+            DataFrame: 文件中包含该时间段内全部K线时返回,否则返回None
+        """
+        if not self.cache_dir or not start_time or not end_time or period not in PERIOD_SECONDS:
+            return None
+        
+        path = self._stream_klines_path(period)
+        if not os.path.exists(path):
+            return None
+        
+        try:
+            df = pd.read_parquet(path)
+        except Exception:
+            return None
+        
+        # 批次窗口的结束时间可能在未来,只要求覆盖到最近一根已收盘的K线
+        period_ms = PERIOD_SECONDS[period] * 1000
+        end_time = min(end_time, int(time.time() * 1000) - period_ms)
+        
+        start_ts = pd.Timestamp(start_time, unit='ms', tz='UTC')
+        end_ts = pd.Timestamp(end_time, unit='ms', tz='UTC')
+        window_df = df[(df['timestamp'] >= start_ts) & (df['timestamp'] <= end_ts)]
+        
+        # 时间段内应有的K线数量(开盘时间对齐到周期)
+        expected = end_time // period_ms - (start_time + period_ms - 1) // period_ms + 1
+        if expected <= 0 or len(window_df) < expected:
+            return None
+        
+        return window_df.reset_index(drop=True)
+    
+    def _stream_klines_append(self, period, df):
+        """将收盘K线追加到实时K线流文件(按开盘时间去重)"""
+        path = self._stream_klines_path(period)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            df = pd.concat([pd.read_parquet(path), df], ignore_index=True)
+            df = df.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp')
+        
+        tmp_path = f"{path}.tmp"
+        df.to_parquet(tmp_path, compression='zstd', index=False)
+        os.replace(tmp_path, path)
+    
+    def stream_klines(self, period='5m', duration=None):
+        """
+        通过websocket订阅实时K线(fstream.binance.com),将收盘K线追加保存到缓存目录
+        
+        之后 get_klines 请求的时间段如已被完整覆盖,将直接读取本地文件,
+        重复获取最近一段时间的数据时只需通过REST补齐缺口。收盘K线分批写入文件,
+        连接断开时自动重连。按 Ctrl+C 停止。
+        
+        参数:
+            period: 时间周期 '5m','15m','30m','1h','2h','4h','6h','12h','1d'
+            duration: 订阅时长(秒),为None时一直运行
+        
+        返回:
+            int: 保存的收盘K线数量(按 Ctrl+C 停止时同样返回停止前已保存的数量),
+                 0 表示没有保存任何K线
+        """
+        if websockets is None:
+            print("✗ 需要安装 websockets 才能订阅实时K线")
+            return 0
+        if not self.cache_dir:
+            print("✗ 未设置缓存目录,无法保存实时K线")
+            return 0
+        
+        # 已保存数量在协程中累加,Ctrl+C 中断协程后仍可读取
+        saved = [0]
+        try:
+            asyncio.run(self._stream_klines_async(period, duration, saved))
+        except KeyboardInterrupt:
+            print(f"\n已停止订阅实时K线,共保存 {saved[0]} 根收盘K线")
+        return saved[0]
+    
+    async def _stream_klines_async(self, period, duration, saved):
+        """
+        订阅K线流并保存收盘K线,saved[0] 累计已写入文件的数量
+        
+        收盘K线先放入缓冲区,每 STREAM_FLUSH_CANDLES 根或每 STREAM_FLUSH_INTERVAL 秒写入一次文件
+        (每次写入都要读出并重写整个文件,不逐根写入);连接断开(币安每24小时断开一次连接)
+        或连接失败时写入缓冲区,等待后自动重连,等待时间从1秒起倍增,最长 STREAM_MAX_BACKOFF 秒
+        """
+        url = f"wss://fstream.binance.com/ws/{self.symbol.lower()}@kline_{period}"
+        deadline = None if duration is None else time.monotonic() + duration
+        buffer = []
+        last_flush = time.monotonic()
+        backoff = 1
+        
+        def remaining():
+            return None if deadline is None else deadline - time.monotonic()
+        
+        def flush():
+            nonlocal last_flush
+            last_flush = time.monotonic()
+            if not buffer:
+                return
+            self._stream_klines_append(period, pd.concat(buffer, ignore_index=True))
+            saved[0] += len(buffer)
+            print(f"  💾 已写入 {len(buffer)} 根收盘K线")
+            buffer.clear()
+        
+        print(f"📡 订阅 {self.symbol} {period} 实时K线: {url}")
+        try:
+            while deadline is None or remaining() > 0:
+                try:
+                    async with websockets.connect(url) as ws:
+                        backoff = 1
+                        while deadline is None or remaining() > 0:
+                            # 没有新消息时也按时写入缓冲区
+                            timeout = STREAM_FLUSH_INTERVAL if deadline is None else min(STREAM_FLUSH_INTERVAL, remaining())
+                            try:
+                                message = await asyncio.wait_for(ws.recv(), max(timeout, 0))
+                            except asyncio.TimeoutError:
+                                message = None
+                            
+                            if message is not None:
+                                k = json.loads(message)['k']
+                                if k['x']:  # 只保存已收盘的K线
+                                    df = records_to_frame([k], {
+                                        'open': 'o',
+                                        'high': 'h',
+                                        'low': 'l',
+                                        'close': 'c',
+                                        'volume': 'v',
+                                    }, time_key='t')
+                                    buffer.append(df)
+                                    print(f"  ✓ 收盘K线 {df['timestamp'].iloc[0].strftime('%Y-%m-%d %H:%M')} 收盘价 {df['close'].iloc[0]}")
+                            
+                            if len(buffer) >= STREAM_FLUSH_CANDLES or time.monotonic() - last_flush >= STREAM_FLUSH_INTERVAL:
+                                flush()
+                
+                except (websockets.exceptions.WebSocketException, OSError) as e:
+                    flush()
+                    wait_time = backoff if deadline is None else min(backoff, max(remaining(), 0))
+                    print(f"  ⚠ 连接断开: {str(e)[:100]}")
+                    print(f"  ⏳ 等待 {wait_time:.0f} 秒后重连...")
+                    await asyncio.sleep(wait_time)
+                    backoff = min(backoff * 2, STREAM_MAX_BACKOFF)
+        finally:
+            # 正常结束、Ctrl+C 中断时都写入缓冲区中剩余的K线
+            flush()
+    
+    def _get_batched_data(self, fetch_func, data_name, period, start_date, end_date, time_delta=None, limit=500):
         """
         通用的分批获取数据方法
         
         参数:
             fetch_func: 获取数据的函数
             data_name: 数据名称(用于显示)
-            period: 时间周期
+            period: 时间周期,为None时不向fetch_func传递period(如资金费率)
             start_date: 开始日期
             end_date: 结束日期
+            time_delta: 每个批次覆盖的时间跨度,为None时根据period确定
+            limit: 每个批次请求的数据条数
         
         返回:
             DataFrame: 完整数据
         """
-        all_data = []
-        current_start = start_date
-        last_timestamp = None  # 记录上一次的最后时间戳,用于检测是否陷入循环
-        
         period_map = {
             '5m': timedelta(minutes=2500),
             '15m': timedelta(minutes=7500),
@@ -464,65 +960,66 @@ class BinanceOIHistory:
             '1d': timedelta(days=500),
         }
         
-        time_delta = period_map.get(period, timedelta(hours=500))
-        
-        batch_num = 0
-        consecutive_failures = 0  # 连续失败次数
-        max_consecutive_failures = 3  # 最大连续失败次数
-        
-        while current_start < end_date:
-            batch_num += 1
-            current_end = min(current_start + time_delta, end_date)
-            
-            print(f"  📥 批次 {batch_num}: 请求时间段 {current_start.strftime('%Y-%m-%d %H:%M')} 至 {current_end.strftime('%Y-%m-%d %H:%M')}")
+        if time_delta is None:
+            time_delta = period_map.get(period, timedelta(hours=500))
+        
+        fetch_kwargs = {'limit': limit}
+        if period is not None:
+            fetch_kwargs['period'] = period
+        
+        # 批次窗口只取决于起止时间和周期,预先全部算出(毫秒时间戳),便于并发请求
+        # 每个窗口为 [start, start + time_delta - 1ms],保证单个窗口不超过limit条
+        # 窗口对齐到从1970-01-01起、间隔time_delta的固定网格,与请求的起止时间无关:
+        # 起始时间每次不同(如默认的"30天前")时,已收盘的窗口参数不变,缓存才能命中
+        start_ms = _to_ms(start_date)
+        end_ms = _to_ms(end_date)
+        delta_ms = int(time_delta.total_seconds() * 1000)
+        windows = [
+            (window_start, window_start + delta_ms - 1)
+            for window_start in range(start_ms - start_ms % delta_ms, end_ms, delta_ms)
+        ]
+        
+        def fmt_ms(ms):
+            return datetime.fromtimestamp(ms / 1000).strftime('%Y-%m-%d %H:%M')
+        
+        def fetch_window(batch):
+            batch_num, (window_start, window_end) = batch
+            print(f"  📥 {data_name} 批次 {batch_num}/{len(windows)}: 请求时间段 {fmt_ms(window_start)} 至 {fmt_ms(window_end)}")
             
             df = fetch_func(
-                period=period,
-                start_time=current_start,
-                end_time=current_end,
-                limit=500
+                start_time=window_start,
+                end_time=window_end,
+                **fetch_kwargs
             )
             
             if df is not None and len(df) > 0:
-                # 获取本次数据的最后时间戳
-                current_last_timestamp = df['timestamp'].iloc[-1]
-                
-                # 检测是否陷入循环(时间戳没有推进)
-                if last_timestamp is not None and current_last_timestamp <= last_timestamp:
-                    print(f"  ⚠ 批次 {batch_num}: 时间未推进,已到达数据末尾")
-                    break
-                
-                all_data.append(df)
-                print(f"  ✓ 批次 {batch_num}: 成功获取 {len(df)} 条数据 ({df['timestamp'].iloc[0].strftime('%Y-%m-%d %H:%M')} 至 {df['timestamp'].iloc[-1].strftime('%Y-%m-%d %H:%M')})")
-                
-                # 更新下次开始时间和上次时间戳
-                last_timestamp = current_last_timestamp
-                current_start = current_last_timestamp + timedelta(milliseconds=1)
-                consecutive_failures = 0  # 重置连续失败计数
-                
-                # 如果已经到达或超过结束时间,停止循环
-                if current_last_timestamp >= end_date:
-                    print(f"  ✓ 已到达结束时间")
-                    break
-                    
+                print(f"  ✓ {data_name} 批次 {batch_num}/{len(windows)}: 成功获取 {len(df)} 条数据 ({df['timestamp'].iloc[0].strftime('%Y-%m-%d %H:%M')} 至 {df['timestamp'].iloc[-1].strftime('%Y-%m-%d %H:%M')})")
             else:
-                consecutive_failures += 1
-                print(f"  ✗ 批次 {batch_num}: 未获取到数据 (连续失败 {consecutive_failures} 次)")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"  ⚠ 连续失败 {max_consecutive_failures} 次,停止获取")
-                    break
-                
-                # 即使失败也推进时间,避免无限循环
-                current_start = current_end + timedelta(milliseconds=1)
+                print(f"  ✗ {data_name} 批次 {batch_num}/{len(windows)}: 未获取到数据")
+                df = None
             
-            # 请求间隔,避免触发API限制
-            time.sleep(2)
+            return df
         
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            results = list(executor.map(fetch_window, enumerate(windows, start=1)))
+        
+        all_data = [df for df in results if df is not None]
+        
+        result = None
         if all_data:
             result = pd.concat(all_data, ignore_index=True)
-            result = result.drop_duplicates(subset=['timestamp'])
-            result = result.sort_values('timestamp').reset_index(drop=True)
+            # 按时间戳的int64表示一次完成去重和排序(保留首次出现的记录)
+            ts = pd.DatetimeIndex(result['timestamp']).asi8
+            _, idx = np.unique(ts, return_index=True)
+            result = result.iloc[idx]
+            # 首尾窗口超出请求范围的部分不返回
+            in_range = result['timestamp'].between(
+                pd.Timestamp(start_ms, unit='ms', tz='UTC'),
+                pd.Timestamp(end_ms, unit='ms', tz='UTC')
+            )
+            result = result[in_range].reset_index(drop=True)
+        
+        if result is not None and len(result) > 0:
             print(f"  ✅ {data_name}获取完成: 共 {len(result)} 条数据")
             print(f"     时间范围: {result['timestamp'].iloc[0].strftime('%Y-%m-%d %H:%M:%S')} 至 {result['timestamp'].iloc[-1].strftime('%Y-%m-%d %H:%M:%S')}\n")
             return result
@@ -530,81 +1027,6 @@ class BinanceOIHistory:
             print(f"  ❌ {data_name}获取失败\n")
             return None
 
-    def _get_batched_funding_rate(self, start_date, end_date):
-        """
-        分批获取资金费率数据(特殊处理,因为资金费率每8小时一次)
-        
-        参数:
-            start_date: 开始日期
-            end_date: 结束日期
-        
-        返回:
-            DataFrame: 完整资金费率数据
-        """
-        all_data = []
-        current_start = start_date
-        last_timestamp = None
-        
-        # 资金费率每次最多返回1000条,每8小时一次,所以1000条约覆盖333天
-        time_delta = timedelta(days=300)
-        
-        batch_num = 0
-        consecutive_failures = 0
-        max_consecutive_failures = 3
-        
-        while current_start < end_date:
-            batch_num += 1
-            current_end = min(current_start + time_delta, end_date)
-            
-            print(f"  📥 批次 {batch_num}: 请求时间段 {current_start.strftime('%Y-%m-%d %H:%M')} 至 {current_end.strftime('%Y-%m-%d %H:%M')}")
-            
-            df = self.get_funding_rate(
-                start_time=current_start,
-                end_time=current_end,
-                limit=1000
-            )
-            
-            if df is not None and len(df) > 0:
-                current_last_timestamp = df['timestamp'].iloc[-1]
-                
-                if last_timestamp is not None and current_last_timestamp <= last_timestamp:
-                    print(f"  ⚠ 批次 {batch_num}: 时间未推进,已到达数据末尾")
-                    break
-                
-                all_data.append(df)
-                print(f"  ✓ 批次 {batch_num}: 成功获取 {len(df)} 条数据 ({df['timestamp'].iloc[0].strftime('%Y-%m-%d %H:%M')} 至 {df['timestamp'].iloc[-1].strftime('%Y-%m-%d %H:%M')})")
-                
-                last_timestamp = current_last_timestamp
-                current_start = current_last_timestamp + timedelta(milliseconds=1)
-                consecutive_failures = 0
-                
-                if current_last_timestamp >= end_date:
-                    print(f"  ✓ 已到达结束时间")
-                    break
-                    
-            else:
-                consecutive_failures += 1
-                print(f"  ✗ 批次 {batch_num}: 未获取到数据 (连续失败 {consecutive_failures} 次)")
-                
-                if consecutive_failures >= max_consecutive_failures:
-                    print(f"  ⚠ 连续失败 {max_consecutive_failures} 次,停止获取")
-                    break
-                
-                current_start = current_end + timedelta(milliseconds=1)
-            
-            time.sleep(2)
-        
-        if all_data:
-            result = pd.concat(all_data, ignore_index=True)
-            result = result.drop_duplicates(subset=['timestamp'])
-            result = result.sort_values('timestamp').reset_index(drop=True)
-            print(f"  ✅ 资金费率数据获取完成: 共 {len(result)} 条数据")
-            print(f"     时间范围: {result['timestamp'].iloc[0].strftime('%Y-%m-%d %H:%M:%S')} 至 {result['timestamp'].iloc[-1].strftime('%Y-%m-%d %H:%M:%S')}\n")
-            return result
-        else:
-            print(f"  ❌ 资金费率数据获取失败\n")
-            return None
-    
     def get_all_comprehensive_data(self, period='5m', start_date=None, end_date=None):
         """
         获取所有综合数据(持仓量、多空比、基差、资金费率等)
@@ -633,74 +1055,143 @@ class BinanceOIHistory:
         print(f"时间周期: {period}")
         print(f"{'='*70}\n")
         
-        # 1. 获取持仓量数据
-        print("📊 [1/7] 获取持仓量数据...")
-        oi_data = self._get_batched_data(
-            self.get_open_interest_hist,
-            "持仓量数据",
-            period, start_date, end_date
-        )
-        
-        # 2. 获取大户账户数多空比
-        print("📊 [2/7] 获取大户账户数多空比...")
-        top_account_ratio = self._get_batched_data(
-            self.get_top_long_short_account_ratio,
-            "大户账户数多空比",
-            period, start_date, end_date
-        )
-        
-        # 3. 获取大户持仓量多空比
-        print("📊 [3/7] 获取大户持仓量多空比...")
-        top_position_ratio = self._get_batched_data(
-            self.get_top_long_short_position_ratio,
-            "大户持仓量多空比",
-            period, start_date, end_date
-        )
-        
-        # 4. 获取多空持仓人数比
-        print("📊 [4/7] 获取多空持仓人数比...")
-        global_ratio = self._get_batched_data(
-            self.get_global_long_short_account_ratio,
-            "多空持仓人数比",
-            period, start_date, end_date
-        )
+        # 各数据类型相互独立,使用线程池并发获取(总耗时取决于最慢的一类,而不是各类之和)
+        # 并发请求数由 _make_request 中的信号量统一限制
+        tasks = [
+            ('open_interest', "持仓量数据", self.get_open_interest_hist, period, {}),
+            ('top_account_ratio', "大户账户数多空比", self.get_top_long_short_account_ratio, period, {}),
+            ('top_position_ratio', "大户持仓量多空比", self.get_top_long_short_position_ratio, period, {}),
+            ('global_ratio', "多空持仓人数比", self.get_global_long_short_account_ratio, period, {}),
+            ('basis', "基差数据", self.get_basis_data, period, {}),
+            ('klines', "K线数据(OHLC)", self.get_klines, period, {}),
+            # 资金费率每8小时一次,每次最多返回1000条,300天约900条
+            ('funding_rate', "资金费率数据", self.get_funding_rate, None, {'time_delta': timedelta(days=300), 'limit': 1000}),
+        ]
+        
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            futures = {}
+            for i, (key, data_name, fetch_func, fetch_period, kwargs) in enumerate(tasks, start=1):
+                print(f"📊 [{i}/{len(tasks)}] 获取{data_name}...")
+                futures[key] = executor.submit(
+                    self._get_batched_data,
+                    fetch_func, data_name, fetch_period, start_date, end_date, **kwargs
+                )
+            
+            results = {key: future.result() for key, future in futures.items()}
         
-        # 5. 获取基差数据
-        print("📊 [5/7] 获取基差数据...")
-        basis_data = self._get_batched_data(
-            self.get_basis_data,
-            "基差数据",
-            period, start_date, end_date
-        )
-
-        # 6. 获取K线数据(OHLC)
-        print("📊 [6/7] 获取K线数据(OHLC)...")
-        klines_data = self._get_batched_data(
-            self.get_klines,
-            "K线数据",
-            period, start_date, end_date
-        )
-
-        # 7. 获取资金费率数据
-        print("📊 [7/7] 获取资金费率数据...")
-        funding_rate_data = self._get_batched_funding_rate(start_date, end_date)
+        self._prune_cache()
 
         print(f"{'='*70}")
         print(f"✓ 所有数据获取完成!")
         print(f"{'='*70}\n")
 
-        return {
-            'open_interest': oi_data,
-            'top_account_ratio': top_account_ratio,
-            'top_position_ratio': top_position_ratio,
-            'global_ratio': global_ratio,
-            'basis': basis_data,
-            'klines': klines_data,
-            'funding_rate': funding_rate_data  # 添加资金费率数据
-        }
+        return results
 
 
-    def export_to_excel(self, data_dict, period, start_date, end_date, filename=None):
+    def _default_export_filename(self, period, start_date, end_date):
+        """
+        生成默认导出文件名(不含扩展名): 币种_开始时间_结束时间_周期
+        """
+        # 转换时间格式
+        if isinstance(start_date, str):
+            start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+        else:
+            start_dt = start_date
+        
+        if isinstance(end_date, str):
+            end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+        else:
+            end_dt = end_date
+        
+        # 格式化时间字符串: YYYYMMDD_HHMM (使用北京时间)
+        # 将UTC时间转换为北京时间(不带时区信息的时间按UTC处理)
+        def to_beijing_str(dt):
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt.astimezone(BEIJING_TZ).strftime('%Y%m%d_%H%M')
+        
+        start_str = to_beijing_str(start_dt)
+        end_str = to_beijing_str(end_dt)
+        
+        return f"{self.symbol}_{start_str}_{end_str}_{period}"
+    
+    def _merge_export_data(self, data_dict):
+        """
+        将所有数据按时间合并为一个DataFrame(北京时间,数值按导出精度处理)
+        
+        参数:
+            data_dict: 包含所有数据的字典
+        
+        返回:
+            DataFrame: 合并后的数据,没有任何数据时返回None
+        """
+        # 辅助函数:取出指定列并改名,以UTC时间为索引
+        def to_block(df, columns, n=None):
+            """取出columns({原列名: 导出列名})中的列,n不为None时保留n位有效数字"""
+            # 直接在float64 ndarray上处理,最后只构造一次DataFrame(省去rename/set_index产生的中间副本)
+            values = df[list(columns)].to_numpy(dtype='float64')
+            if n is not None:
+                values = sig_round(values, n)
+            # 时间精确到秒(资金费率时间常带有几毫秒偏差)
+            index = pd.DatetimeIndex(df['timestamp']).floor('s').rename('时间')
+            return pd.DataFrame(values, index=index, columns=list(columns.values()))
+        
+        # 各数据源以UTC时间为索引,最后一次性按索引对齐合并
+        parts = []
+        for key, label, columns, sig_figs in EXPORT_SOURCES:
+            if data_dict.get(key) is not None:
+                parts.append(to_block(data_dict[key], columns, n=sig_figs))
+                print(f"  ✓ 添加{label}")
+        
+        if not parts:
+            return None
+        
+        # 按时间索引对齐合并并排序(各数据源时间点一致,无需merge_asof)
+        merged_df = parts[0].join(parts[1:], how='outer').sort_index()
+        # 合并后统一转换为北京时间(UTC+8),去掉时区信息以便作为Excel原生日期时间写出(不再逐行格式化为字符串)
+        merged_df.index = merged_df.index.tz_convert(BEIJING_TZ).tz_localize(None)
+        return merged_df.reset_index()
+    
+    def _print_export_summary(self, filepath, merged_df):
+        """打印导出结果"""
+        print(f"\n✓ 数据已成功导出到: {filepath}")
+        print(f"  总记录数: {len(merged_df)}")
+        print(f"  总列数: {len(merged_df.columns)}")
+        print(f"  数据精度: 持仓量和持仓价值保留原数据,其他数据保留4位有效数字,资金费率保留6位有效数字")
+        print(f"  时区: 北京时间 (UTC+8)\n")
+    
+    def _write_excel(self, filepath, merged_df):
+        """
+        将合并后的数据写入Excel的'综合数据'工作表
+        
+        安装了xlsxwriter时逐行流式写出: constant_memory模式下每写完一行即落盘,内存占用不随行数增长
+        (pandas的to_excel按列逐个写单元格,不能配合该模式使用);否则使用pandas + openpyxl
+        """
+        if xlsxwriter is None:
+            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
+                merged_df.to_excel(writer, sheet_name='综合数据', index=False)
+                writer.sheets['综合数据'].column_dimensions['A'].width = 20  # 时间列加宽,避免显示为####
+            return
+        
+        # 时间列写为带格式的数值日期单元格,而不是共享字符串表中的字符串
+        workbook = xlsxwriter.Workbook(filepath, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        })
+        try:
+            worksheet = workbook.add_worksheet('综合数据')
+            worksheet.set_column(0, 0, 20)  # 时间列加宽,避免显示为####
+            # 表头格式与pandas导出的一致
+            header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+            worksheet.write_row(0, 0, merged_df.columns, header_format)
+            # 逐行取值写出,不预先把整个表格转换为Python对象;缺失值(NaN/NaT,v != v)写为空单元格
+            rows = merged_df.itertuples(index=False, name=None)
+            for row_idx, row in enumerate(rows, start=1):
+                worksheet.write_row(row_idx, 0, [None if v != v else v for v in row])
+        finally:
+            workbook.close()
+    
+    def export_to_excel(self, data_dict, period, start_date, end_date, filename=None, fmt='xlsx'):
         """
         导出所有数据到Excel(单个sheet,所有数据合并)
         
@@ -710,167 +1201,49 @@ class BinanceOIHistory:
             start_date: 开始日期(datetime对象)
             end_date: 结束日期(datetime对象)
             filename: 自定义文件名(不含扩展名),如果为None则自动生成
+            fmt: 导出格式 'xlsx'(默认)、'parquet'(需要pyarrow) 或 'csv'
+                 parquet/csv 省去了Excel的XML生成和压缩,写入快得多,适合程序读取
         
         返回:
             str: 保存的文件路径
         """
+        if fmt not in ('xlsx', 'parquet', 'csv'):
+            print(f"\n✗ 不支持的导出格式: {fmt} (可选: xlsx, parquet, csv)\n")
+            return None
+        
         if not filename:
-            # 转换时间格式
-            if isinstance(start_date, str):
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-            else:
-                start_dt = start_date
-            
-            if isinstance(end_date, str):
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d')
-            else:
-                end_dt = end_date
-            
-            # 格式化时间字符串: YYYYMMDD_HHMM (使用北京时间)
-            # 将UTC时间转换为北京时间
-            start_str = (start_dt + timedelta(hours=8)).strftime('%Y%m%d_%H%M')
-            end_str = (end_dt + timedelta(hours=8)).strftime('%Y%m%d_%H%M')
-            
-            # 构建文件名: 币种_开始时间_结束时间_周期
-            filename = f"{self.symbol}_{start_str}_{end_str}_{period}"
+            filename = self._default_export_filename(period, start_date, end_date)
         
-        filepath = f"{filename}.xlsx"
+        filepath = f"{filename}.{fmt}"
         
         print(f"正在导出数据到 {filepath}...")
         
-        # 辅助函数:将数字转换为n位有效数字
-        def round_to_n_sig_figs(x, n=4):
-            """将数字保留n位有效数字"""
-            if pd.isna(x) or x == 0:
-                return x
-            from math import log10, floor
-            return round(x, -int(floor(log10(abs(x)))) + (n - 1))
-        
-        # 辅助函数:将UTC时间转换为北京时间字符串
-        def to_beijing_time_str(timestamp):
-            """将pandas timestamp转换为北京时间字符串"""
-            beijing_time = timestamp + pd.Timedelta(hours=8)
-            return beijing_time.strftime('%Y-%m-%d %H:%M:%S')
-        
-        # 合并所有数据到一个DataFrame
-        merged_df = None
-        
-        # 1. 从持仓量数据开始 (保留原数据,不做有效数字处理)
-        if data_dict.get('open_interest') is not None:
-            df = data_dict['open_interest']
-            merged_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '持仓量': df['sumOpenInterest'],  # 保留原数据
-                '持仓价值(USD)': df['sumOpenInterestValue'],  # 保留原数据
-            })
-            print(f"  ✓ 添加持仓量数据")
-        
-        # 2. 合并大户账户数多空比 (保留4位有效数字)
-        if data_dict.get('top_account_ratio') is not None:
-            df = data_dict['top_account_ratio']
-            temp_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '大户账户多空比': df['longShortRatio'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '大户多头账户占比': df['longAccount'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '大户空头账户占比': df['shortAccount'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-            })
-            if merged_df is not None:
-                merged_df = pd.merge(merged_df, temp_df, on='时间', how='outer')
-            else:
-                merged_df = temp_df
-            print(f"  ✓ 添加大户账户数多空比")
-        
-        # 3. 合并大户持仓量多空比 (保留4位有效数字)
-        if data_dict.get('top_position_ratio') is not None:
-            df = data_dict['top_position_ratio']
-            temp_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '大户持仓多空比': df['longShortRatio'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '大户多头持仓占比': df['longAccount'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '大户空头持仓占比': df['shortAccount'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-            })
-            if merged_df is not None:
-                merged_df = pd.merge(merged_df, temp_df, on='时间', how='outer')
-            else:
-                merged_df = temp_df
-            print(f"  ✓ 添加大户持仓量多空比")
-        
-        # 4. 合并多空持仓人数比 (保留4位有效数字)
-        if data_dict.get('global_ratio') is not None:
-            df = data_dict['global_ratio']
-            temp_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '全市场多空比': df['longShortRatio'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '全市场多头人数占比': df['longAccount'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '全市场空头人数占比': df['shortAccount'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-            })
-            if merged_df is not None:
-                merged_df = pd.merge(merged_df, temp_df, on='时间', how='outer')
-            else:
-                merged_df = temp_df
-            print(f"  ✓ 添加多空持仓人数比")
-        
-        # 5. 合并基差数据 (保留4位有效数字)
-        if data_dict.get('basis') is not None:
-            df = data_dict['basis']
-            temp_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '基差': df['basis'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '基差率': df['basisRate'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-            })
-            if merged_df is not None:
-                merged_df = pd.merge(merged_df, temp_df, on='时间', how='outer')
-            else:
-                merged_df = temp_df
-            print(f"  ✓ 添加基差数据")
-        
-        # 6. 合并K线数据(OHLC) (保留4位有效数字)
-        if data_dict.get('klines') is not None:
-            df = data_dict['klines']
-            temp_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '开盘价': df['open'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '最高价': df['high'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '最低价': df['low'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '收盘价': df['close'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-                '成交量': df['volume'].apply(lambda x: round_to_n_sig_figs(x, 4)),
-            })
-            if merged_df is not None:
-                merged_df = pd.merge(merged_df, temp_df, on='时间', how='outer')
-            else:
-                merged_df = temp_df
-            print(f"  ✓ 添加K线数据(OHLC)")
-
-        # 7. 合并资金费率数据 (保留6位有效数字,因为资金费率通常很小)
-        if data_dict.get('funding_rate') is not None:
-            df = data_dict['funding_rate']
-            temp_df = pd.DataFrame({
-                '时间': df['timestamp'].apply(to_beijing_time_str),
-                '资金费率': df['fundingRate'].apply(lambda x: round_to_n_sig_figs(x, 6)),
-            })
-            if merged_df is not None:
-                merged_df = pd.merge(merged_df, temp_df, on='时间', how='outer')
-            else:
-                merged_df = temp_df
-            print(f"  ✓ 添加资金费率数据")
-
-        # 按时间排序
-        if merged_df is not None:
-            merged_df = merged_df.sort_values('时间').reset_index(drop=True)
-            
-            # 导出到Excel
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                merged_df.to_excel(writer, sheet_name='综合数据', index=False)
-            
-            print(f"\n✓ 数据已成功导出到: {filepath}")
-            print(f"  总记录数: {len(merged_df)}")
-            print(f"  总列数: {len(merged_df.columns)}")
-            print(f"  数据精度: 持仓量和持仓价值保留原数据,其他数据保留4位有效数字,资金费率保留6位有效数字")
-            print(f"  时区: 北京时间 (UTC+8)\n")
-            return filepath
-        else:
+        merged_df = self._merge_export_data(data_dict)
+        if merged_df is None:
             print(f"\n✗ 没有数据可导出\n")
             return None
+        
+        if fmt == 'parquet':
+            merged_df.to_parquet(filepath, compression='zstd', index=False)
+        elif fmt == 'csv':
+            # utf-8-sig 带BOM,用Excel打开时中文列名不会乱码
+            merged_df.to_csv(filepath, index=False, encoding='utf-8-sig')
+        else:
+            self._write_excel(filepath, merged_df)
+        
+        self._print_export_summary(filepath, merged_df)
+        return filepath
+    
+    def export_to_parquet(self, data_dict, period, start_date, end_date, filename=None):
+        """
+        导出所有数据到Parquet(列式存储,写入速度和文件大小都远优于Excel,需要pyarrow)
+        
+        参数与 export_to_excel 相同
+        
+        返回:
+            str: 保存的文件路径
+        """
+        return self.export_to_excel(data_dict, period, start_date, end_date, filename=filename, fmt='parquet')
 
 
 def main():
@@ -910,28 +1283,26 @@ def main():
         end_date=end_date
     )
     
-    # 检查是否有数据
-    has_data = any(data_dict.get(key) is not None for key in data_dict.keys())
+    # 检查是否有数据(data_dict按持仓量、多空比...资金费率的顺序排列)
+    present = [df for df in data_dict.values() if df is not None]
     
-    if has_data:
+    if present:
         # 获取实际的开始和结束日期(用于文件名)
-        actual_start = None
-        actual_end = None
-        for key in ['open_interest', 'top_account_ratio', 'top_position_ratio', 'global_ratio', 'basis', 'klines', 'funding_rate']:
-            if data_dict.get(key) is not None:
-                df = data_dict[key]
-                actual_start = df['timestamp'].iloc[0]
-                actual_end = df['timestamp'].iloc[-1]
-                break
+        actual_start = present[0]['timestamp'].iloc[0]
+        actual_end = present[0]['timestamp'].iloc[-1]
         
-        # 自动导出Excel
+        # 自动导出(默认Excel)
+        export_fmt = input("请输入导出格式 xlsx/parquet/csv (默认: xlsx): ").strip().lower()
+        if not export_fmt:
+            export_fmt = "xlsx"
         custom_filename = input("请输入自定义文件名 (回车使用自动生成): ").strip()
         fetcher.export_to_excel(
             data_dict, 
             period=period,
-            start_date=actual_start if actual_start else start_date,
-            end_date=actual_end if actual_end else end_date,
-            filename=custom_filename if custom_filename else None
+            start_date=actual_start,
+            end_date=actual_end,
+            filename=custom_filename if custom_filename else None,
+            fmt=export_fmt
         )
     else:
         print("\n✗ 未获取到任何数据,无法导出")
@@ -1,13 +1,81 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib import rcParams
 import os
+from collections import namedtuple
+from datetime import datetime
 from math import floor, log10
 
-# 设置中文字体
-rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
-rcParams['axes.unicode_minus'] = False
+try:
+    from scipy.spatial import cKDTree  # 鼠标悬停时的最近点查询(可选,未安装时使用NumPy逐点计算距离)
+except ImportError:
+    cKDTree = None
+
+# matplotlib在开始绘图时才导入(见_lazy_mpl),输入文件名和读取数据时不必等待
+plt = None
+mdates = None
+
+
+def _lazy_mpl():
+    """选择后端、导入matplotlib并设置中文字体(只在第一次调用时执行)"""
+    global plt, mdates
+    if plt is not None:
+        return
+    import matplotlib
+    # 使用支持交互的后端(必须在导入pyplot之前选择);已用MPLBACKEND环境变量指定后端时不覆盖
+    if 'MPLBACKEND' not in os.environ:
+        matplotlib.use('TkAgg')
+    import matplotlib.pyplot
+    import matplotlib.dates
+    from matplotlib import rcParams
+    
+    # 设置中文字体
+    rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
+    rcParams['axes.unicode_minus'] = False
+    
+    plt = matplotlib.pyplot
+    mdates = matplotlib.dates
+
+
+# 每条曲线最多绘制的点数,超过时用LTTB降采样(14英寸宽的图上更多的点也分辨不出来)
+MAX_PLOT_POINTS = 2000
+
+# 一条曲线: 列名、图例标签、y轴标签、颜色、其他绘图参数、数值缩放倍数(None表示不缩放)
+SeriesSpec = namedtuple('SeriesSpec', 'column label ylabel color style scale')
+
+# 一张图: 标题、曲线列表(第一条画在主y轴,其余各占一个右侧y轴)、收盘价曲线的绘图参数、水平参考线位置(None表示不画)
+PlotSpec = namedtuple('PlotSpec', 'title series close_style axhline')
+
+PLOT_SPECS = [
+    PlotSpec('图1: 持仓量和价格', [
+        SeriesSpec('持仓量', '持仓量', '持仓量', 'b', {'linewidth': 2}, None),
+    ], {'linewidth': 2.5, 'alpha': 0.8}, None),
+    PlotSpec('图2: 大户账户多空比 + 价格', [
+        SeriesSpec('大户账户多空比', '大户账户多空比', '多空比', 'purple', {'linewidth': 2.5}, None),
+    ], {'linewidth': 2.5, 'alpha': 0.8}, 1),
+    PlotSpec('图3: 大户持仓多空比 + 价格', [
+        SeriesSpec('大户持仓多空比', '大户持仓多空比', '多空比', 'purple', {'linewidth': 2.5}, None),
+    ], {'linewidth': 2, 'alpha': 0.7}, 1),
+    PlotSpec('图4: 全市场多空比 + 价格', [
+        SeriesSpec('全市场多空比', '全市场多空比', '多空比', 'purple', {'linewidth': 2.5}, None),
+    ], {'linewidth': 2, 'alpha': 0.7}, 1),
+    PlotSpec('图5: 基差、基差率和价格', [
+        SeriesSpec('基差', '基差', '基差', 'b', {'linewidth': 2}, None),
+        SeriesSpec('基差率', '基差率(%)', '基差率(%)', 'r', {'linewidth': 2}, None),
+    ], {'linewidth': 2.5, 'alpha': 0.8}, 0),
+    # 资金费率转换为百分比(乘以100),使用线条+明显的标记点
+    PlotSpec('图6: 资金费率和收盘价', [
+        SeriesSpec('资金费率', '资金费率(%)', '资金费率(%)', 'b', {
+            'linewidth': 2, 'marker': 'o', 'markersize': 6, 'markerfacecolor': 'blue',
+            'markeredgecolor': 'darkblue', 'markeredgewidth': 1,
+        }, 100),
+    ], {'linewidth': 2.5, 'alpha': 0.8}, 0),
+    PlotSpec('图7: 持仓市值比与收盘价', [
+        SeriesSpec('持仓市值比', '持仓市值比', '持仓市值比', 'b', {'linewidth': 2.5}, None),
+    ], {'linewidth': 2.5, 'alpha': 0.8}, None),
+]
+
+# 七张图共用的绘图数据: '时间'列转换后的matplotlib日期数值、{列名: float64数组}(只含文件中存在的列)、是否有收盘价
+PlotData = namedtuple('PlotData', 'x columns has_close')
 
 def format_significant_figures(value, sig_figs=3):
     """格式化数字为指定的有效数字"""
@@ -29,14 +97,63 @@ def format_significant_figures(value, sig_figs=3):
     
     return formatted
 
+
+def format_significant_figures_array(values, sig_figs=3):
+    """
+    批量格式化数字为指定的有效数字,结果与逐个调用 format_significant_figures 相同
+    
+    数量级用NumPy一次算出,再按小数位数分组,每组使用同一个格式字符串;NaN/inf原样转为字符串
+    
+    返回:
+        ndarray(object): 格式化后的字符串
+    """
+    a = np.asarray(values, dtype='float64')
+    out = np.empty(a.shape, dtype=object)
+    finite = np.isfinite(a)
+    out[~finite] = [str(v) for v in a[~finite].tolist()]
+    nonzero = finite & (a != 0)
+    out[finite & (a == 0)] = "0"
+    
+    # 计算数量级
+    magnitude = np.zeros(a.shape, dtype='int64')
+    magnitude[nonzero] = np.floor(np.log10(np.abs(a[nonzero])))
+    
+    # 大数字: 不保留小数,添加千分位分隔符
+    big = nonzero & (magnitude >= sig_figs - 1)
+    out[big] = [f"{v:,.0f}" for v in a[big].tolist()]
+    
+    # 小数: 按小数位数分组格式化
+    small = nonzero & ~big
+    decimal_places = sig_figs - magnitude - 1
+    for places in np.unique(decimal_places[small]):
+        mask = small & (decimal_places == places)
+        spec = f".{places}f"
+        out[mask] = [format(v, spec) for v in a[mask].tolist()]
+    
+    return out
+
+
+# 必需列
+REQUIRED_COLUMNS = [
+    '时间', '持仓量', '持仓价值(USD)',
+    '大户账户多空比', '大户多头账户占比', '大户空头账户占比',
+    '大户持仓多空比', '大户多头持仓占比', '大户空头持仓占比',
+    '全市场多空比', '全市场多头人数占比', '全市场空头人数占比',
+    '基差', '基差率', '资金费率'
+]
+
+# 可选列
+OPTIONAL_COLUMNS = ['收盘价', '开盘价', '最高价', '最低价']
+
+
 def get_excel_file():
-    """交互式获取Excel文件名"""
+    """交互式获取数据文件名(支持 .xlsx / .csv / .parquet)"""
     print("=" * 60)
     print("欢迎使用期货数据可视化分析程序")
     print("=" * 60)
     
     while True:
-        excel_file = input("\n请输入Excel文件名(包含扩展名): ").strip()
+        excel_file = input("\n请输入数据文件名(包含扩展名,支持xlsx/csv/parquet): ").strip()
         
         if not excel_file:
             print("✗ 文件名不能为空,请重新输入")
@@ -52,20 +169,95 @@ def get_excel_file():
         return excel_file
 
 
+def parquet_columns(parquet_file, wanted):
+    """
+    返回Parquet文件中属于wanted的列名(保持文件中的顺序),只读取文件元数据
+    
+    参数:
+    parquet_file: Parquet文件路径
+    wanted: 需要的列名集合
+    
+    返回:
+    list: 文件中存在且需要的列名
+    """
+    import pyarrow.parquet as pq
+    return [col for col in pq.read_schema(parquet_file).names if col in wanted]
+
+
+def load_data(data_file):
+    """
+    按扩展名读取数据文件,只解析程序用到的列
+    
+    - .csv / .parquet: 直接用pd.read_csv / pd.read_parquet读取,比解析Excel快得多
+    - 其他(Excel): 读取后在旁边保存一份Parquet缓存(文件名后加.parquet,需要pyarrow),
+      再次运行时如果缓存不比Excel文件旧、且包含需要的列,直接读取缓存
+    """
+    # 必需列、可选列以及各图表绘制的列(如图7的'持仓市值比')
+    # 用函数筛选列: 文件中缺少的列不会报错,交给validate_columns提示
+    wanted = set(REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    wanted.update(s.column for spec in PLOT_SPECS for s in spec.series)
+    usecols = lambda col: col in wanted
+    
+    ext = os.path.splitext(data_file)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(data_file, usecols=usecols, encoding='utf-8-sig')
+    if ext == '.parquet':
+        return pd.read_parquet(data_file, columns=parquet_columns(data_file, wanted))
+    
+    cache_file = data_file + '.parquet'
+    
+    # 缓存不比Excel文件旧、且包含Excel中所有需要的列时才使用,否则重新解析Excel
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(data_file):
+        try:
+            source_columns = pd.read_excel(data_file, engine='openpyxl', nrows=0).columns
+            needed = [col for col in source_columns if col in wanted]
+            if set(needed).issubset(parquet_columns(cache_file, wanted)):
+                return pd.read_parquet(cache_file, columns=needed)
+        except (ImportError, OSError, ValueError):
+            pass  # 缓存不可用时重新解析Excel
+    
+    df = pd.read_excel(data_file, engine='openpyxl', usecols=usecols)
+    try:
+        df.to_parquet(cache_file, index=False)
+    except (ImportError, OSError, ValueError, TypeError):
+        pass  # 缓存写入失败(如未安装pyarrow)不影响使用
+    return df
+
+
+# CSV中'时间'列可能的字符串格式
+TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d']
+
+
+def parse_time_column(times):
+    """
+    把'时间'列转换为datetime
+    
+    Excel/Parquet读出的已经是datetime,直接返回;CSV读出的是字符串,按第一个非空值确定格式后
+    用format=解析(C实现的快速路径),避免pandas逐个推断格式;无法解析的值转换为NaT
+    """
+    if pd.api.types.is_datetime64_any_dtype(times):
+        return times
+    
+    valid = times.dropna()
+    if len(valid):
+        sample = str(valid.iloc[0])
+        for fmt in TIME_FORMATS:
+            try:
+                datetime.strptime(sample, fmt)
+            except ValueError:
+                continue
+            try:
+                return pd.to_datetime(times, format=fmt, cache=True)
+            except ValueError:
+                break  # 各行格式不一致或有无法解析的值,交给pandas推断
+    return pd.to_datetime(times, errors='coerce')
+
+
 def validate_columns(df):
     """验证Excel文件是否包含所需的列"""
-    required_columns = [
-        '时间', '持仓量', '持仓价值(USD)',
-        '大户账户多空比', '大户多头账户占比', '大户空头账户占比',
-        '大户持仓多空比', '大户多头持仓占比', '大户空头持仓占比',
-        '全市场多空比', '全市场多头人数占比', '全市场空头人数占比',
-        '基差', '基差率', '资金费率'
-    ]
-    
-    # 可选列
-    optional_columns = ['收盘价', '开盘价', '最高价', '最低价']
-    
-    missing_columns = [col for col in required_columns if col not in df.columns]
+    # 先转成集合,成员判断不再逐个扫描df.columns
+    columns = set(df.columns)
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
     
     if missing_columns:
         print("\n✗ 错误: Excel文件中缺少以下必需列:")
@@ -74,7 +266,7 @@ def validate_columns(df):
         return False
     
     # 检查可选列并提示
-    missing_optional = [col for col in optional_columns if col not in df.columns]
+    missing_optional = [col for col in OPTIONAL_COLUMNS if col not in columns]
     if missing_optional:
         print("\n⚠️  提示: Excel文件中缺少以下可选列:")
         for col in missing_optional:
@@ -84,515 +276,323 @@ def validate_columns(df):
     return True
 
 
-def create_figure(df, plot_func, title):
-    """创建单个图表"""
+def create_figure(data, spec, hover=None):
+    """创建单个图表(data为PlotData,hover为HoverManager)"""
     fig = plt.figure(figsize=(14, 8))
     ax = fig.add_subplot(111)
-    plot_func(ax, df)
-    fig.suptitle(title, fontsize=16, fontweight='bold')
+    plot_generic(ax, data, spec, hover)
+    fig.suptitle(spec.title, fontsize=16, fontweight='bold')
     plt.tight_layout()
     return fig
 
 
-def plot1_position(ax, df):
-    """图1: 持仓量和收盘价(双轴图表)"""
-    # 检查是否有收盘价数据
-    has_close_price = '收盘价' in df.columns
-    
-    if not has_close_price:
-        print("⚠️  警告: 缺少'收盘价'列,无法绘制价格走势")
-        # 只画持仓量
-        line1, = ax.plot(df['时间'], df['持仓量'], 'b-', label='持仓量', linewidth=2, picker=5)
-        
-        ax.set_xlabel('时间', fontsize=12)
-        ax.set_ylabel('持仓量', color='b', fontsize=12)
-        ax.tick_params(axis='y', labelcolor='b')
-        
-        lines = [line1]
-        axes_list = [ax]
-    else:
-        # 有收盘价数据 - 双轴图表
-        ax_twin = ax.twinx()
-        
-        line1, = ax.plot(df['时间'], df['持仓量'], 'b-', label='持仓量', linewidth=2, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['收盘价'], 'orange', label='收盘价', linewidth=2.5, alpha=0.8, picker=5)
-        
-        ax.set_xlabel('时间', fontsize=12)
-        ax.set_ylabel('持仓量', color='b', fontsize=12)
-        ax_twin.set_ylabel('收盘价', color='orange', fontsize=12)
-        
-        ax.tick_params(axis='y', labelcolor='b')
-        ax_twin.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    
-    ax.grid(True, alpha=0.3)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-    
-    labels = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc='upper left', fontsize=10)
-    
-    # 在图片右下角添加固定文本框
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            # 检测所有线
-            for i, line in enumerate(lines):
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
-                    label = line.get_label()
-                    
-                    # 从DataFrame中获取原始时间
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    
-                    # 使用3位有效数字格式化
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
-                    
-                    annot.set_text(text)
-                    annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
-                    return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
+def lttb(x, y, n_out=MAX_PLOT_POINTS):
+    """
+    Largest-Triangle-Three-Buckets降采样,返回保留点的下标
+    
+    首尾两点保留,中间的点按顺序均分为n_out-2个桶,每个桶选出与上一个已选点、下一个桶均值点
+    构成的三角形面积最大的点,能保留曲线的峰谷形状;点数不超过n_out时全部保留
+    """
+    n = len(x)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, n_out - 1).astype('int64')
+    # 各桶的均值点一次算出;第i个桶使用第i+1个桶的均值,最后一个桶使用末尾点
+    counts = np.diff(edges)
+    avg_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])[1:]
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])[1:]
+    
+    keep = np.empty(n_out, dtype='int64')
+    keep[0] = 0
+    keep[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((x[a] - avg_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[i] - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
 
 
+def downsample_indices(x, y, n_out=MAX_PLOT_POINTS):
+    """
+    选出用于绘图的点的下标(点数不超过n_out时返回全部)
+    
+    对有效点做LTTB降采样,并保留每段缺失值(NaN)的第一个点,使曲线在缺失处仍然断开
+    """
+    if len(y) <= n_out:
+        return slice(None)
+    finite = np.isfinite(y)
+    valid = np.flatnonzero(finite)
+    keep = valid[lttb(x[valid], y[valid], n_out)]
+    gap_starts = np.flatnonzero(finite[:-1] & ~finite[1:]) + 1
+    return np.union1d(keep, gap_starts)
 
-def plot2_account_ratio(ax, df):
-    """图2: 大户账户多空比 + 价格"""
-    # 检查是否有收盘价数据
-    has_close_price = '收盘价' in df.columns
-    
-    if has_close_price:
-        # 创建双轴
-        ax_twin = ax.twinx()
-        
-        line1, = ax.plot(df['时间'], df['大户账户多空比'], 'purple', label='大户账户多空比', linewidth=2.5, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['收盘价'], 'orange', label='收盘价', linewidth=2.5, alpha=0.8, picker=5)
-        
-        ax.set_ylabel('多空比', color='purple', fontsize=12)
-        ax_twin.set_ylabel('收盘价', color='orange', fontsize=12)
-        ax_twin.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    else:
-        line1, = ax.plot(df['时间'], df['大户账户多空比'], 'purple', label='大户账户多空比', linewidth=2.5, picker=5)
-        
-        ax.set_ylabel('多空比', color='purple', fontsize=12)
-        
-        lines = [line1]
-        axes_list = [ax]
-    
-    ax.set_xlabel('时间', fontsize=12)
-    ax.tick_params(axis='y', labelcolor='purple')
-    ax.grid(True, alpha=0.3)
-    ax.axhline(y=1, color='gray', linestyle='--', alpha=0.5)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-    
-    labels = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc='upper left', fontsize=10)
-    
-    # 在图片右下角添加固定文本框
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            for line in lines:
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
-                    label = line.get_label()
-                    
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
-                    annot.set_text(text)
-                    annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
-                    return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
 
-def plot3_position_ratio(ax, df):
-    """图3: 大户持仓多空比 + 价格"""
-    has_close_price = '收盘价' in df.columns
-    
-    if has_close_price:
-        ax_twin = ax.twinx()
-        
-        line1, = ax.plot(df['时间'], df['大户持仓多空比'], 'purple', label='大户持仓多空比', linewidth=2.5, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['收盘价'], 'orange', label='收盘价', linewidth=2, alpha=0.7, picker=5)
-        
-        ax.set_ylabel('多空比', color='purple', fontsize=12)
-        ax_twin.set_ylabel('收盘价', color='orange', fontsize=12)
-        ax_twin.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    else:
-        line1, = ax.plot(df['时间'], df['大户持仓多空比'], 'purple', label='大户持仓多空比', linewidth=2.5, picker=5)
-        
-        ax.set_ylabel('多空比', color='purple', fontsize=12)
-        
-        lines = [line1]
-        axes_list = [ax]
-    
-    ax.set_xlabel('时间', fontsize=12)
-    ax.tick_params(axis='y', labelcolor='purple')
-    ax.grid(True, alpha=0.3)
-    ax.axhline(y=1, color='gray', linestyle='--', alpha=0.5)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-    
-    labels = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc='upper left', fontsize=10)
-    
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            for line in lines:
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
-                    label = line.get_label()
-                    
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
-                    annot.set_text(text)
-                    annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
-                    return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
+def connect_view_downsampling(axes_list, lines, x, ys):
+    """
+    缩放、平移后按可见范围重新降采样
+    
+    用二分查找取出可见区间(两端各多取一个点,使曲线画到边缘),只对这一段做LTTB后set_data:
+    放大后能看到完整细节,而每条曲线绘制的点数始终不超过MAX_PLOT_POINTS
+    
+    参数:
+        axes_list: 共用x轴的坐标轴(缩放、平移只触发其中被操作的那个的回调)
+        lines: 曲线
+        x: 时间(matplotlib日期数值,升序)
+        ys: 与lines对应的完整数值
+    """
+    if len(x) <= MAX_PLOT_POINTS:
+        return  # 数据点不多时全部绘制,无需处理
+    
+    def on_xlim_changed(ax):
+        x0, x1 = ax.get_xlim()
+        lo = max(np.searchsorted(x, x0) - 1, 0)
+        hi = min(np.searchsorted(x, x1, side='right') + 1, len(x))
+        x_view = x[lo:hi]
+        for line, y in zip(lines, ys):
+            y_view = y[lo:hi]
+            keep = downsample_indices(x_view, y_view)
+            line.set_data(x_view[keep], y_view[keep])
+        ax.figure.canvas.draw_idle()
+    
+    for ax in axes_list:
+        ax.callbacks.connect('xlim_changed', on_xlim_changed)
 
-def plot4_market_ratio(ax, df):
-    """图4: 全市场多空比 + 价格"""
-    has_close_price = '收盘价' in df.columns
-    
-    if has_close_price:
-        ax_twin = ax.twinx()
-        
-        line1, = ax.plot(df['时间'], df['全市场多空比'], 'purple', label='全市场多空比', linewidth=2.5, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['收盘价'], 'orange', label='收盘价', linewidth=2, alpha=0.7, picker=5)
-        
-        ax.set_ylabel('多空比', color='purple', fontsize=12)
-        ax_twin.set_ylabel('收盘价', color='orange', fontsize=12)
-        ax_twin.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    else:
-        line1, = ax.plot(df['时间'], df['全市场多空比'], 'purple', label='全市场多空比', linewidth=2.5, picker=5)
-        
-        ax.set_ylabel('多空比', color='purple', fontsize=12)
-        
-        lines = [line1]
-        axes_list = [ax]
-    
-    ax.set_xlabel('时间', fontsize=12)
-    ax.tick_params(axis='y', labelcolor='purple')
-    ax.grid(True, alpha=0.3)
-    ax.axhline(y=1, color='gray', linestyle='--', alpha=0.5)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-    
-    labels = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc='upper left', fontsize=10)
-    
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            for line in lines:
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
-                    label = line.get_label()
-                    
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
-                    annot.set_text(text)
-                    annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
-                    return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
 
-def plot5_basis(ax, df):
-    """图5: 基差和基差率 + 价格"""
-    has_close_price = '收盘价' in df.columns
-    
-    if has_close_price:
-        ax_twin = ax.twinx()
-        ax_twin2 = ax.twinx()
-        ax_twin2.spines['right'].set_position(('outward', 60))
-        
-        line1, = ax.plot(df['时间'], df['基差'], 'b-', label='基差', linewidth=2, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['基差率'], 'r-', label='基差率(%)', linewidth=2, picker=5)
-        line3, = ax_twin2.plot(df['时间'], df['收盘价'], 'orange', label='收盘价', linewidth=2.5, alpha=0.8, picker=5)
-        
-        ax.set_ylabel('基差', color='b', fontsize=12)
-        ax_twin.set_ylabel('基差率(%)', color='r', fontsize=12)
-        ax_twin2.set_ylabel('收盘价', color='orange', fontsize=12)
-        ax_twin.tick_params(axis='y', labelcolor='r')
-        ax_twin2.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2, line3]
-        axes_list = [ax, ax_twin, ax_twin2]
+def build_hover_index(line, x, y):
+    """
+    将曲线的完整数据点(不受绘图降采样影响)转换为屏幕像素坐标并建立最近点索引
+    
+    参数:
+        line: 曲线(提供坐标变换)
+        x: 时间(matplotlib日期数值)
+        y: 数值
+    
+    返回:
+        (cKDTree或像素坐标数组, 各点对应的df行号) 缺失值(NaN)不参与索引
+    """
+    xy = line.get_transform().transform(np.column_stack([x, y]))
+    rows = np.flatnonzero(np.isfinite(xy).all(axis=1))
+    points = xy[rows]
+    if cKDTree is not None and len(points) > 0:
+        return cKDTree(points), rows
+    return points, rows
+
+
+def query_hover_index(index, x, y, radius):
+    """查找距离屏幕坐标(x, y)不超过radius像素的最近数据点,返回其df行号,没有则返回None"""
+    tree, rows = index
+    if len(rows) == 0:
+        return None
+    if cKDTree is not None:
+        dist, i = tree.query((x, y), distance_upper_bound=radius)
+        if np.isinf(dist):
+            return None
     else:
-        ax_twin = ax.twinx()
-        
-        line1, = ax.plot(df['时间'], df['基差'], 'b-', label='基差', linewidth=2, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['基差率'], 'r-', label='基差率(%)', linewidth=2, picker=5)
-        
-        ax.set_ylabel('基差', color='b', fontsize=12)
-        ax_twin.set_ylabel('基差率(%)', color='r', fontsize=12)
-        ax_twin.tick_params(axis='y', labelcolor='r')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    
-    ax.set_xlabel('时间', fontsize=12)
-    ax.tick_params(axis='y', labelcolor='b')
-    ax.grid(True, alpha=0.3)
-    ax.axhline(y=0, color='gray', linestyle='--', alpha=0.5)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-    
-    labels = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc='upper left', fontsize=10)
-    
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            for line in lines:
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
+        dist2 = ((tree - (x, y)) ** 2).sum(axis=1)
+        i = int(np.argmin(dist2))
+        if dist2[i] > radius ** 2:
+            return None
+    return rows[i]
+
+
+class HoverManager:
+    """
+    鼠标悬停显示数据: 在图片右下角添加固定文本框,鼠标靠近数据点时显示该点的时间和数值
+    
+    所有图表共用一个管理器: 时间字符串只生成一次,每张图只注册一次回调,回调按事件所属的图表
+    找到该图的数据(不再为每张图创建捕获df的闭包)
+    
+    - 每条线的完整数据点(不受绘图降采样影响)预先转换为屏幕坐标并建立空间索引,每次鼠标移动只做一次
+      最近点查询;缩放、平移或改变窗口大小后坐标变换改变,索引随之重建
+    - 后端支持blit时,文本框不参与整图重绘: 整图绘制后保存背景,悬停时只恢复背景并单独画出文本框
+    """
+    
+    def __init__(self, times, x):
+        """
+        参数:
+            times: '时间'列(datetime)
+            x: '时间'列转换后的matplotlib日期数值
+        """
+        # 时间字符串一次性向量化生成,悬停时直接按行号取用
+        self.time_strs = times.dt.strftime('%Y-%m-%d %H:%M').to_numpy()
+        self.x = x
+        # {figure: 该图的悬停状态}
+        self.figures = {}
+    
+    def add(self, ax, lines, ys, axes_list):
+        """
+        为一张图注册悬停显示
+        
+        参数:
+            ax: 主坐标轴(文本框所在)
+            lines: 参与悬停检测的曲线(按优先级排列)
+            ys: 与lines对应的完整数值
+            axes_list: 鼠标位于其中任一坐标轴内时才检测
+        """
+        canvas = ax.figure.canvas
+        annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
+                       fontsize=10, verticalalignment='bottom', horizontalalignment='right',
+                       bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
+        annot.set_visible(False)
+        annot.set_animated(canvas.supports_blit)
+        
+        self.figures[ax.figure] = {
+            'canvas': canvas,   # 注册时的画布
+            'ax': ax,
+            'annot': annot,
+            'lines': lines,
+            'axes_list': axes_list,
+            'full_data': dict(zip(lines, ys)),
+            'indexes': {},      # {line: (坐标变换矩阵, 索引)}
+            'value_strs': {},   # {line: 各点数值按3位有效数字格式化后的字符串},第一次悬停到该线时批量生成
+            'background': None,
+            'visible': False,   # 文本框是否显示,自行记录,悬停时不必查询artist状态
+        }
+        
+        # matplotlib只以弱引用保存绑定方法形式的回调,由图表持有管理器,保证图表存在期间回调有效
+        ax.figure.hover_manager = self
+        if canvas.supports_blit:
+            canvas.mpl_connect("draw_event", self._on_draw)
+        canvas.mpl_connect("motion_notify_event", self._on_hover)
+    
+    def _get_index(self, state, line):
+        matrix = line.get_transform().get_affine().get_matrix().tobytes()
+        cached = state['indexes'].get(line)
+        if cached is None or cached[0] != matrix:
+            cached = (matrix, build_hover_index(line, self.x, state['full_data'][line]))
+            state['indexes'][line] = cached
+        return cached[1]
+    
+    def _get_state(self, event):
+        """
+        取出事件所属图表的悬停状态
+        
+        事件不是由注册时的画布发出(如保存为pdf/svg时matplotlib临时替换的画布)时返回None
+        """
+        state = self.figures.get(event.canvas.figure)
+        if state is None or event.canvas is not state['canvas']:
+            return None
+        return state
+    
+    def _on_draw(self, event):
+        # 整图重绘(首次显示、缩放、平移、改变窗口大小)后重新保存背景
+        state = self._get_state(event)
+        if state is None or not event.canvas.supports_blit:
+            return
+        ax = state['ax']
+        state['background'] = event.canvas.copy_from_bbox(ax.bbox)
+        if state['visible']:
+            ax.draw_artist(state['annot'])
+    
+    def _refresh(self, canvas, state):
+        if state['background'] is None:
+            canvas.draw_idle()
+            return
+        ax = state['ax']
+        canvas.restore_region(state['background'])
+        if state['visible']:
+            ax.draw_artist(state['annot'])
+        canvas.blit(ax.bbox)
+    
+    def _on_hover(self, event):
+        state = self._get_state(event)
+        if state is None:
+            return
+        if event.inaxes in state['axes_list']:
+            # 检测所有线
+            for line in state['lines']:
+                idx = query_hover_index(self._get_index(state, line), event.x, event.y, line.get_pickradius())
+                if idx is not None:
+                    value_strs = state['value_strs']
+                    if line not in value_strs:
+                        # 使用3位有效数字格式化
+                        value_strs[line] = format_significant_figures_array(state['full_data'][line], 3)
                     label = line.get_label()
                     
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
+                    text = f"时间: {self.time_strs[idx]}\n{label}: {value_strs[line][idx]}"
+                    
+                    annot = state['annot']
                     annot.set_text(text)
                     annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
+                    state['visible'] = True
+                    self._refresh(event.canvas, state)
                     return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
+            if state['visible']:
+                state['annot'].set_visible(False)
+                state['visible'] = False
+                self._refresh(event.canvas, state)
 
 
-def plot6_funding_rate(ax, df):
-    """图6: 资金费率 + 收盘价"""
-    has_close_price = '收盘价' in df.columns
-    has_funding_rate = '资金费率' in df.columns
-    
-    if not has_funding_rate:
-        print("⚠️  警告: 缺少'资金费率'列,无法绘制资金费率图表")
-        ax.text(0.5, 0.5, '缺少资金费率数据', 
+def plot_generic(ax, data, spec, hover=None):
+    """
+    按PlotSpec绘制一张图: 第一条曲线画在ax上,其余曲线和收盘价(如有)各占一个右侧y轴
+    
+    data为PlotData,直接绘制其中的数值数组,不必每次从df取列或由matplotlib转换datetime;
+    hover不为None时为该图注册鼠标悬停显示
+    """
+    x = data.x
+    missing = [s.column for s in spec.series if s.column not in data.columns]
+    if missing:
+        print(f"⚠️  警告: 缺少'{missing[0]}'列,无法绘制{spec.title}")
+        ax.text(0.5, 0.5, f'缺少{missing[0]}数据', 
                transform=ax.transAxes, 
                fontsize=16, 
                ha='center', 
                va='center')
         return
     
-    # 将资金费率转换为百分比(乘以100)
-    funding_rate_percent = df['资金费率'] * 100
+    series = list(spec.series)
+    if data.has_close:
+        series.append(SeriesSpec('收盘价', '收盘价', '收盘价', 'orange', spec.close_style, None))
     
-    if has_close_price:
-        ax_twin = ax.twinx()
-        
-        # 资金费率:使用线条+明显的标记点
-        line1, = ax.plot(df['时间'], funding_rate_percent, 'b-o', 
-                        label='资金费率(%)', linewidth=2, 
-                        markersize=6, markerfacecolor='blue', 
-                        markeredgecolor='darkblue', markeredgewidth=1,
-                        picker=5)
-        
-        # 收盘价:只用线条
-        line2, = ax_twin.plot(df['时间'], df['收盘价'], 'orange', 
-                             label='收盘价', linewidth=2.5, alpha=0.8, picker=5)
-        
-        ax.set_ylabel('资金费率(%)', color='b', fontsize=12)
-        ax_twin.set_ylabel('收盘价', color='orange', fontsize=12)
-        ax.tick_params(axis='y', labelcolor='b')
-        ax_twin.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    else:
-        line1, = ax.plot(df['时间'], funding_rate_percent, 'b-o', 
-                        label='资金费率(%)', linewidth=2, 
-                        markersize=6, markerfacecolor='blue', 
-                        markeredgecolor='darkblue', markeredgewidth=1,
-                        picker=5)
-        ax.set_ylabel('资金费率(%)', color='b', fontsize=12)
-        ax.tick_params(axis='y', labelcolor='b')
-        lines = [line1]
-        axes_list = [ax]
+    lines = []
+    ys = []
+    axes_list = []
+    for i, s in enumerate(series):
+        if i == 0:
+            target = ax
+        else:
+            target = ax.twinx()
+            if i >= 2:
+                # 第三个及以后的y轴向外偏移,避免刻度重叠
+                target.spines['right'].set_position(('outward', 60 * (i - 1)))
+        
+        y = data.columns[s.column]
+        if s.scale is not None:
+            y = y * s.scale
+        # 只绘制降采样后的点,悬停查询仍使用完整数据
+        keep = downsample_indices(x, y)
+        line, = target.plot(x[keep], y[keep], color=s.color, label=s.label, picker=5, **s.style)
+        target.set_ylabel(s.ylabel, color=s.color, fontsize=12)
+        target.tick_params(axis='y', labelcolor=s.color)
+        
+        lines.append(line)
+        ys.append(y)
+        axes_list.append(target)
     
     ax.set_xlabel('时间', fontsize=12)
     ax.grid(True, alpha=0.3)
-    ax.axhline(y=0, color='gray', linestyle='--', alpha=0.5)
+    if spec.axhline is not None:
+        ax.axhline(y=spec.axhline, color='gray', linestyle='--', alpha=0.5)
+    ax.xaxis_date()  # x轴数值按日期刻度显示
     ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
     plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
     
     labels = [l.get_label() for l in lines]
     ax.legend(lines, labels, loc='upper left', fontsize=10)
     
-    # 在图片右下角添加固定文本框
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            for line in lines:
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
-                    label = line.get_label()
-                    
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
-                    
-                    annot.set_text(text)
-                    annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
-                    return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
-
-
-def plot7_position_value_price(ax, df):
-    """图7: 持仓市值比与收盘价"""
-    has_close_price = '收盘价' in df.columns
-    
-    if not has_close_price:
-        print("⚠️  警告: 缺少'收盘价'列,无法绘制价格走势")
-        # 只画持仓市值比
-        line1, = ax.plot(df['时间'], df['持仓市值比'], 'b-', label='持仓市值比', linewidth=2.5, picker=5)
-        
-        ax.set_xlabel('时间', fontsize=12)
-        ax.set_ylabel('持仓市值比', color='b', fontsize=12)
-        ax.tick_params(axis='y', labelcolor='b')
-        
-        lines = [line1]
-        axes_list = [ax]
-    else:
-        # 创建双轴图表
-        ax_twin = ax.twinx()
-        
-        line1, = ax.plot(df['时间'], df['持仓市值比'], 'b-', label='持仓市值比', linewidth=2.5, picker=5)
-        line2, = ax_twin.plot(df['时间'], df['收盘价'], 'orange', label='收盘价', linewidth=2.5, alpha=0.8, picker=5)
-        
-        ax.set_xlabel('时间', fontsize=12)
-        ax.set_ylabel('持仓市值比', color='b', fontsize=12)
-        ax_twin.set_ylabel('收盘价', color='orange', fontsize=12)
-        
-        ax.tick_params(axis='y', labelcolor='b')
-        ax_twin.tick_params(axis='y', labelcolor='orange')
-        
-        lines = [line1, line2]
-        axes_list = [ax, ax_twin]
-    
-    ax.grid(True, alpha=0.3)
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-    
-    labels = [l.get_label() for l in lines]
-    ax.legend(lines, labels, loc='upper left', fontsize=10)
-    
-    # 在图片右下角添加固定文本框
-    annot = ax.text(0.98, 0.02, "", transform=ax.transAxes, 
-                   fontsize=10, verticalalignment='bottom', horizontalalignment='right',
-                   bbox=dict(boxstyle='round', facecolor='yellow', alpha=0.8))
-    annot.set_visible(False)
-    
-    def on_hover(event):
-        if event.inaxes in axes_list:
-            vis = annot.get_visible()
-            for line in lines:
-                cont, ind = line.contains(event)
-                if cont:
-                    idx = ind["ind"][0]
-                    y_val = line.get_ydata()[idx]
-                    label = line.get_label()
-                    
-                    time_str = df.iloc[idx]['时间'].strftime('%Y-%m-%d %H:%M')
-                    formatted_val = format_significant_figures(y_val, 3)
-                    text = f"时间: {time_str}\n{label}: {formatted_val}"
-                    
-                    annot.set_text(text)
-                    annot.set_visible(True)
-                    ax.figure.canvas.draw_idle()
-                    return
-            if vis:
-                annot.set_visible(False)
-                ax.figure.canvas.draw_idle()
-    
-    ax.figure.canvas.mpl_connect("motion_notify_event", on_hover)
+    connect_view_downsampling(axes_list, lines, x, ys)
+    if hover is not None:
+        hover.add(ax, lines, ys, axes_list)
 
 
 def calculate_period_funding_rate(df):
-    """计算特定时间段的平均资金费率"""
+    """计算特定时间段的平均资金费率(df以'时间'为索引并已按时间升序排列)"""
     print("\n" + "=" * 60)
     print("计算时间段平均资金费率")
     print("=" * 60)
@@ -603,8 +603,8 @@ def calculate_period_funding_rate(df):
         return
     
     # 显示数据的时间范围
-    min_date = df['时间'].min()
-    max_date = df['时间'].max()
+    min_date = df.index.min()
+    max_date = df.index.max()
     print(f"\n数据时间范围: {min_date.strftime('%Y-%m-%d %H:%M')} 至 {max_date.strftime('%Y-%m-%d %H:%M')}")
     
     while True:
@@ -630,16 +630,15 @@ def calculate_period_funding_rate(df):
                 continue
             
             # 筛选时间段内的数据
-            mask = (df['时间'] >= start_time) & (df['时间'] <= end_time)
-            period_df = df[mask]
+            period_df = df.loc[start_time:end_time]
             
             if len(period_df) == 0:
                 print(f"✗ 在指定时间段内没有找到数据")
                 continue
             
-            # 过滤掉资金费率为0或NaN的数据点(这些可能是无效数据)
-            valid_funding_rate = period_df['资金费率'].dropna()
-            valid_funding_rate = valid_funding_rate[valid_funding_rate != 0]
+            # 过滤掉资金费率为0或NaN的数据点(这些可能是无效数据),用一个掩码直接在NumPy数组上筛选
+            rates = period_df['资金费率'].to_numpy(dtype='float64')
+            valid_funding_rate = rates[~np.isnan(rates) & (rates != 0)]
             
             if len(valid_funding_rate) == 0:
                 print(f"✗ 在指定时间段内没有有效的资金费率数据")
@@ -671,14 +670,14 @@ def calculate_period_funding_rate(df):
 
 
 def calculate_period_average(df):
-    """计算特定时间段的平均基差和基差率"""
+    """计算特定时间段的平均基差和基差率(df以'时间'为索引并已按时间升序排列)"""
     print("\n" + "=" * 60)
     print("计算时间段平均值")
     print("=" * 60)
     
     # 显示数据的时间范围
-    min_date = df['时间'].min()
-    max_date = df['时间'].max()
+    min_date = df.index.min()
+    max_date = df.index.max()
     print(f"\n数据时间范围: {min_date.strftime('%Y-%m-%d %H:%M')} 至 {max_date.strftime('%Y-%m-%d %H:%M')}")
     
     while True:
@@ -704,8 +703,7 @@ def calculate_period_average(df):
                 continue
             
             # 筛选时间段内的数据
-            mask = (df['时间'] >= start_time) & (df['时间'] <= end_time)
-            period_df = df[mask]
+            period_df = df.loc[start_time:end_time]
             
             if len(period_df) == 0:
                 print(f"✗ 在指定时间段内没有找到数据")
@@ -732,22 +730,31 @@ def calculate_period_average(df):
                 break
 
 
-def plot_futures_analysis(excel_file):
-    """生成7张独立的期货分析图表"""
-    df = pd.read_excel(excel_file)
-    df['时间'] = pd.to_datetime(df['时间'])
-    
-    # 创建7个独立的图表窗口
-    create_figure(df, plot1_position, '图1: 持仓量和价格')
-    create_figure(df, plot2_account_ratio, '图2: 大户账户多空比 + 价格')
-    create_figure(df, plot3_position_ratio, '图3: 大户持仓多空比 + 价格')
-    create_figure(df, plot4_market_ratio, '图4: 全市场多空比 + 价格')
-    create_figure(df, plot5_basis, '图5: 基差、基差率和价格')
-    create_figure(df, plot6_funding_rate, '图6: 资金费率和收盘价')
-    create_figure(df, plot7_position_value_price, '图7: 持仓市值比与收盘价')
+def plot_futures_analysis(df):
+    """
+    生成7张独立的期货分析图表
+    
+    参数:
+        df: 已读取并通过列名验证的数据('时间'列已转换为datetime)
+    """
+    _lazy_mpl()
+    
+    # 时间列只转换一次为matplotlib日期数值,各数值列只取一次为float64数组,所有图表共用
+    x = mdates.date2num(df['时间'].to_numpy())
+    columns = {}
+    for spec in PLOT_SPECS:
+        for col in [s.column for s in spec.series] + ['收盘价']:
+            if col not in columns and col in df.columns:
+                columns[col] = df[col].to_numpy(dtype='float64')
+    data = PlotData(x, columns, '收盘价' in columns)
+    hover = HoverManager(df['时间'], x)
+    
+    # 每个PlotSpec创建一个独立的图表窗口
+    for spec in PLOT_SPECS:
+        create_figure(data, spec, hover)
 
     # 使用非阻塞模式显示图表
-    print("\n✓ 已生成7张图表窗口")
+    print(f"\n✓ 已生成{len(PLOT_SPECS)}张图表窗口")
     print("提示: 在所有图表中将鼠标放在数据线上可在右下角查看详细数据(3位有效数字)")
     print("注意: 在进行计算时,图表交互功能仍然可用")
     
@@ -755,9 +762,8 @@ def plot_futures_analysis(excel_file):
     plt.ion()  # 开启交互模式
     plt.show()
     
-    # 添加事件循环处理,确保图表保持响应
-    import matplotlib
-    matplotlib.use('TkAgg')  # 确保使用支持交互的后端
+    # 以时间为索引(数据已按时间升序排列),计算时用.loc按时间切片,二分查找定位起止行
+    time_indexed_df = df.set_index('时间')
     
     # 循环询问是否需要计算时间段平均值
     while True:
@@ -771,9 +777,9 @@ def plot_futures_analysis(excel_file):
         choice = input("请输入选项(1/2/3): ").strip()
         
         if choice == '1':
-            calculate_period_average(df)
+            calculate_period_average(time_indexed_df)
         elif choice == '2':
-            calculate_period_funding_rate(df)
+            calculate_period_funding_rate(time_indexed_df)
         elif choice == '3':
             break
         else:
@@ -794,7 +800,7 @@ if __name__ == "__main__":
     print(f"\n正在读取文件: {excel_file}")
     
     try:
-        df = pd.read_excel(excel_file)
+        df = load_data(excel_file)
         print(f"✓ 成功读取文件,共 {len(df)} 行数据")
         
         if not validate_columns(df):
@@ -802,9 +808,18 @@ if __name__ == "__main__":
             exit()
         
         print("✓ 列名验证通过")
+        df['时间'] = parse_time_column(df['时间'])
+        # 去掉时间为空或无法解析(NaT)的行,否则排序后的时间索引仍不单调,时间段筛选会报KeyError
+        invalid_times = df['时间'].isna()
+        if invalid_times.any():
+            print(f"⚠️  警告: {invalid_times.sum()} 行的时间为空或无法解析,已忽略")
+            df = df[~invalid_times].reset_index(drop=True)
+        # 按时间升序排列(导出的数据本身已排序),时间段筛选依赖有序的时间列
+        if not df['时间'].is_monotonic_increasing:
+            df = df.sort_values('时间', ignore_index=True)
         print("\n开始生成图表...")
         
-        plot_futures_analysis(excel_file)
+        plot_futures_analysis(df)
         
         print("\n" + "=" * 60)
         print("✓ 分析完成!")
@@ -0,0 +1,57 @@
+"""sig_round 与原逐个计算的 round_to_n_sig_figs 结果一致性测试"""
+
+import importlib.util
+import os
+from math import floor, log10
+
+import numpy as np
+import pandas as pd
+import pytest
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '1获取U本位合约数据binance.py')
+spec = importlib.util.spec_from_file_location('binance_fetch', MODULE_PATH)
+binance_fetch = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(binance_fetch)
+
+
+def round_to_n_sig_figs(x, n=4):
+    """原导出代码中的逐个计算版本(通过Series.apply调用,x为Python float)"""
+    if pd.isna(x) or x == 0:
+        return x
+    return round(x, -int(floor(log10(abs(x)))) + (n - 1))
+
+
+def sample_values():
+    rng = np.random.default_rng(0)
+    random_values = 10 ** rng.uniform(-8, 12, 50000)
+    # 小数位数有限的值(如API返回的'1.2345'),舍入时恰好遇到5的情况最多
+    decimal_values = np.array([float(f"{v:.5g}") for v in 10 ** rng.uniform(-8, 12, 20000)]
+                              + [float(f"{v:.7g}") for v in 10 ** rng.uniform(-8, 12, 20000)])
+    edge_values = np.array([10.0 ** e for e in range(-8, 13)]
+                           + [9.9995 * 10.0 ** e for e in range(-8, 12)]
+                           + [460426572.47, 123456789.0])
+    values = np.concatenate([random_values, decimal_values, edge_values])
+    return np.concatenate([values, -values])
+
+
+@pytest.mark.parametrize('n', [4, 6])
+def test_sig_round_matches_scalar_helper(n):
+    values = sample_values()
+    expected = np.array([round_to_n_sig_figs(float(x), n) for x in values])
+    result = binance_fetch.sig_round(values, n)
+    mismatched = values[result != expected]
+    assert len(mismatched) == 0, f"{len(mismatched)} 个值不一致,如 {mismatched[:5]}"
+
+
+def test_sig_round_large_values_exact():
+    result = binance_fetch.sig_round(np.array([460426572.47, 123456789.0]), 4)
+    assert result.tolist() == [460400000.0, 123500000.0]
+
+
+def test_sig_round_special_values_and_types():
+    values = pd.DataFrame({'a': [0.0, np.nan, np.inf, 1.23456], 'b': [-np.inf, 2.5e-9, 0.0, 98765.4]})
+    result = binance_fetch.sig_round(values, 4)
+    assert isinstance(result, pd.DataFrame)
+    assert result['a'].tolist()[:1] == [0.0] and np.isnan(result['a'][1]) and result['a'][2] == np.inf
+    assert result['a'][3] == 1.235 and result['b'].tolist() == [-np.inf, 2.5e-9, 0.0, 98770.0]
+    assert isinstance(binance_fetch.sig_round(values['a'], 4), pd.Series)